@@ -0,0 +1,169 @@
+import argparse
+import itertools
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from recorder import COLUMN_DTYPE, ladder_column, load_market_log
+
+
+def at_size(columns, ladder, prefix, size):
+    # Linear interpolation between the recorded ladder sizes around `size`
+    ladder = sorted(ladder)
+    if size <= ladder[0]:
+        return columns[ladder_column(prefix, ladder[0])]
+    if size >= ladder[-1]:
+        return columns[ladder_column(prefix, ladder[-1])]
+    hi = next(i for i, s in enumerate(ladder) if s >= size)
+    lo = hi - 1
+    weight = (size - ladder[lo]) / (ladder[hi] - ladder[lo])
+    return (1 - weight) * columns[ladder_column(prefix, ladder[lo])] + (
+        weight * columns[ladder_column(prefix, ladder[hi])]
+    )
+
+
+def replay(columns, metadata, size, min_profit=0.0, gas_multiplier=1.0, slippage=0.0):
+    # The bot's go/no-go rules from evaluate_snapshot, applied to every recorded
+    # check at once for a fixed trade size: each direction's net profit in USD
+    # after its own price impact and gas, and the better one trades if it pays
+    ladder = metadata["ladder"]
+    eth_price = columns["eth_price"]
+    nav = columns["nav"]
+    sell_price_usd = at_size(columns, ladder, "probe_price", size) * eth_price
+    if ladder_column("probe_buy_price", ladder[0]) in columns:
+        # 0x prices a buy in AMKT per ETH
+        buy_price_usd = eth_price / at_size(columns, ladder, "probe_buy_price", size)
+    else:
+        # Logs from before the buy side was quoted priced both ways off the sell
+        buy_price_usd = sell_price_usd
+    data_fee = columns.get("data_fee", 0.0)
+    gas_cost_usd = (
+        (columns["gas_used"] * columns["gas_price"] + data_fee)
+        / 10**18
+        * eth_price
+        * gas_multiplier
+    )
+
+    sell_pnl = size * (sell_price_usd * (1 - slippage) - nav) - gas_cost_usd
+    buy_pnl = size * (nav - buy_price_usd * (1 + slippage)) - gas_cost_usd
+    selling = sell_pnl >= buy_pnl
+    pnl = np.where(selling, sell_pnl, buy_pnl)
+    inventory_ok = np.where(
+        selling,
+        columns["amkt_balance"] >= size,
+        columns["eth_balance"] >= size * nav / eth_price,
+    )
+    trades = inventory_ok & (pnl > 0) & (pnl >= min_profit)
+    sells = trades & selling
+    buys = trades & ~selling
+
+    # Consecutive checks that see the same edge are one opportunity
+    opportunities = trades & ~np.concatenate(([False], trades[:-1]))
+    return {
+        "size": size,
+        "min_profit": min_profit,
+        "gas_multiplier": gas_multiplier,
+        "slippage": slippage,
+        "buys": int(buys.sum()),
+        "sells": int(sells.sum()),
+        "opportunities": int(opportunities.sum()),
+        "pnl_usd": float(pnl[opportunities].sum()),
+    }
+
+
+def sweep(columns, metadata, sizes, min_profits, gas_multipliers, slippages):
+    results = [
+        replay(columns, metadata, *params)
+        for params in itertools.product(sizes, min_profits, gas_multipliers, slippages)
+    ]
+    return sorted(results, key=lambda r: r["pnl_usd"], reverse=True)
+
+
+def write_synthetic_log(directory, rows, ladder, seed=0):
+    # Random-walk market with a mean-reverting premium, for timing the replay
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    eth_price = 3000 * np.exp(np.cumsum(rng.normal(0, 1e-4, rows)))
+    nav = 25 * np.exp(np.cumsum(rng.normal(0, 1e-4, rows)))
+    premium = np.zeros(rows)
+    noise = rng.normal(0, 0.002, rows)
+    for i in range(1, rows):
+        premium[i] = 0.99 * premium[i - 1] + noise[i]
+    columns = {
+        "fetched_at": time.time() + 2.0 * np.arange(rows),
+        "eth_price": eth_price,
+        "nav": nav,
+        "gas_used": np.full(rows, 250000.0),
+        "gas_price": rng.uniform(0.005, 0.05, rows) * 10**9,
+        "data_fee": rng.uniform(1, 5, rows) * 10**12,
+        "eth_balance": np.full(rows, 1.0),
+        "amkt_balance": np.full(rows, 20.0),
+    }
+    for size in ladder:
+        impact = 0.05 + 0.1 * size
+        columns[ladder_column("probe_impact", size)] = np.full(rows, impact)
+        columns[ladder_column("probe_price", size)] = (
+            nav * (1 + premium) * (1 - impact / 100) / eth_price
+        )
+        columns[ladder_column("probe_buy_price", size)] = eth_price / (
+            nav * (1 + premium) * (1 + impact / 100)
+        )
+    for column, values in columns.items():
+        values.astype(COLUMN_DTYPE).tofile(os.path.join(directory, f"{column}.f64"))
+    with open(os.path.join(directory, "columns.json"), "w") as f:
+        json.dump({"columns": list(columns), "metadata": {"ladder": ladder}}, f)
+
+
+def parse_floats(values):
+    return [float(v) for v in values.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded checks")
+    parser.add_argument("log", nargs="?", help="market log directory (MARKET_LOG_DIR)")
+    parser.add_argument("--synthetic", type=int, help="replay N synthetic checks")
+    parser.add_argument("--sizes", default="0.5,1,2,4,8")
+    parser.add_argument("--min-profits", default="0,0.5,1,2")
+    parser.add_argument("--gas-multipliers", default="1,2")
+    parser.add_argument("--slippages", default="0,0.001,0.003")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    directory = args.log
+    if args.synthetic:
+        directory = tempfile.mkdtemp(prefix="market-log-")
+        write_synthetic_log(directory, args.synthetic, [0.5, 1, 2, 4, 8])
+    if directory is None:
+        parser.error("a market log directory or --synthetic is required")
+
+    columns, metadata = load_market_log(directory)
+    started_at = time.perf_counter()
+    results = sweep(
+        columns,
+        metadata,
+        parse_floats(args.sizes),
+        parse_floats(args.min_profits),
+        parse_floats(args.gas_multipliers),
+        parse_floats(args.slippages),
+    )
+    elapsed = time.perf_counter() - started_at
+
+    rows = len(columns["nav"])
+    print(f"Replayed {rows} checks x {len(results)} parameter sets in {elapsed:.2f}s")
+    print(
+        f"{'size':>6} {'min usd':>8} {'gas x':>6} {'slippage':>8} "
+        f"{'buys':>8} {'sells':>8} {'opps':>7} {'pnl usd':>12}"
+    )
+    for r in results[: args.top]:
+        print(
+            f"{r['size']:>6g} {r['min_profit']:>8g} {r['gas_multiplier']:>6g} "
+            f"{r['slippage']:>8g} {r['buys']:>8} {r['sells']:>8} "
+            f"{r['opportunities']:>7} {r['pnl_usd']:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+# End-to-end latency benchmark: runs the bot's check-and-trade path against the
+# local stand-ins in standins.py and reports throughput and latency percentiles
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import time
+
+import numpy as np
+import requests
+from web3 import Web3
+
+from standins import (
+    CmcStandIn,
+    CoinGeckoStandIn,
+    RpcStandIn,
+    SlackStandIn,
+    ZeroExStandIn,
+)
+
+# Anvil's first dev account; the stand-in node accepts anything it signs
+BENCH_PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"
+BENCH_ADDRESS = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+
+MARKET_PRICES = {
+    "BTC": 60000.0,
+    "ETH": 3000.0,
+    "BNB": 550.0,
+    "XRP": 0.5,
+    "SOL": 150.0,
+    "ADA": 0.4,
+    "DOGE": 0.12,
+    "LINK": 14.0,
+    "AVAX": 30.0,
+    "MATIC": 0.6,
+    "DOT": 6.0,
+    "LTC": 70.0,
+    "SHIB": 0.00002,
+    "BCH": 400.0,
+    "UNI": 8.0,
+}
+# AMKT units per token and the token's decimals
+BASKET = {"WBTC": (0.0002, 8), "WSTETH": (0.002, 18), "21CO_SOL": (0.05, 9)}
+STETH_PER_WSTETH = 1.17
+AMKT_PREMIUM = 0.02  # 0x mid price over NAV, so every check finds a trade
+
+# The views the original bot read one contract call at a time
+VIRTUAL_UNITS_ABI = [
+    {
+        "inputs": [],
+        "name": "virtualUnits",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "token", "type": "address"},
+                    {"name": "units", "type": "uint256"},
+                ],
+                "name": "",
+                "type": "tuple[]",
+            }
+        ],
+        "stateMutability": "view",
+        "type": "function",
+    }
+]
+STETH_BY_WSTETH_ABI = [
+    {
+        "inputs": [{"name": "_wstETHAmount", "type": "uint256"}],
+        "name": "getStETHByWstETH",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function",
+    }
+]
+
+
+def start_stand_ins(latency, jitter):
+    kwargs = {"latency": latency, "jitter": jitter}
+    return {
+        "zero_ex": ZeroExStandIn(1.0, **kwargs).start(),
+        "cmc": CmcStandIn(MARKET_PRICES, **kwargs).start(),
+        "coingecko": CoinGeckoStandIn(
+            {"ethereum": MARKET_PRICES["ETH"]}, **kwargs
+        ).start(),
+        "slack": SlackStandIn(**kwargs).start(),
+        "base": RpcStandIn(8453, **kwargs).start(),
+        "mainnet": RpcStandIn(1, block_time=12.0, **kwargs).start(),
+    }
+
+
+def import_bot(stand_ins):
+    # main reads its configuration at import time
+    os.environ.update(
+        {
+            "NETWORK": "base",
+            "PRIVATE_KEY": BENCH_PRIVATE_KEY,
+            "ETH_ADDRESS": BENCH_ADDRESS,
+            "ZX_API_KEY": "bench",
+            "CMC_PRO_API_KEY": "bench",
+            "ZEROX_API_URL": stand_ins["zero_ex"].url,
+            "CMC_API_URL": stand_ins["cmc"].url,
+            "SLACK_WEBHOOK_URL": stand_ins["slack"].url,
+            "RPC_URL": stand_ins["base"].url,
+            "MAINNET_RPC_URL": stand_ins["mainnet"].url,
+            "PRICE_STREAM_URL": "",
+            # Learn the basket from the stand-in node instead of a cached registry
+            "ASSET_REGISTRY_PATH": "",
+            # Measure the code path, not the production request budget
+            "ZEROX_REQUESTS_PER_SECOND": "1000",
+        }
+    )
+    os.environ.pop("MARKET_LOG_DIR", None)
+    import main
+
+    # Every check stands for a new block, so nothing is reused across checks
+    # except what the bot caches across blocks in production (the vault state)
+    for venue in main.venues + [main.primary_venue]:
+        venue.trade_sizer.probe_ttl = 0
+    return main
+
+
+def seed_chain_state(main, stand_ins):
+    mainnet = stand_ins["mainnet"]
+    units = []
+    for symbol, (amount, decimals) in BASKET.items():
+        address = main.KNOWN_ASSETS[symbol][0]
+        units.append((address, int(amount * 10**decimals)))
+        mainnet.view(address, "decimals()", ["uint8"], lambda d=decimals: d)
+        mainnet.view(address, "symbol()", ["string"], lambda s=symbol: s)
+    rate = int(STETH_PER_WSTETH * 10**18)
+    mainnet.view(
+        main.VAULT_ADDRESS, "virtualUnits()", ["(address,uint256)[]"], lambda: units
+    )
+    mainnet.view(
+        main.VAULT_ADDRESS,
+        "underlying()",
+        ["address[]"],
+        lambda: [address for address, _ in units],
+    )
+    mainnet.view(
+        main.WSTETH_ADDRESS,
+        "getStETHByWstETH(uint256)",
+        ["uint256"],
+        lambda amount: amount * rate // 10**18,
+    )
+
+    base = stand_ins["base"]
+    base.balances[BENCH_ADDRESS.lower()] = 10**21
+    # Roughly Base's L1 data fee: a few gwei per byte of calldata
+    base.view(
+        main.network_settings["base"]["GAS_PRICE_ORACLE"],
+        "getL1FeeUpperBound(uint256)",
+        ["uint256"],
+        lambda size: size * 5 * 10**9,
+    )
+    base.view(
+        main.AMKT_TOKEN_ADDRESS,
+        "balanceOf(address)",
+        ["uint256"],
+        lambda owner: 10**21,
+    )
+
+    # Reads the basket through the bot, which registers its assets on the way
+    nav = main.get_amkt_nav()
+    stand_ins["zero_ex"].price = nav * (1 + AMKT_PREMIUM) / MARKET_PRICES["ETH"]
+    return nav
+
+
+class Baseline:
+    # The bot as it was before any of the performance work: plain HTTP providers
+    # and module-level requests calls, one at a time, with nothing cached between
+    # checks. Only the endpoints point at the stand-ins
+    def __init__(self, main, stand_ins):
+        self.main = main
+        self.w3 = Web3(Web3.HTTPProvider(stand_ins["base"].url))
+        self.mainnet_w3 = Web3(Web3.HTTPProvider(stand_ins["mainnet"].url))
+        self.cmc_url = f"{stand_ins['cmc'].url}/v1/cryptocurrency/quotes/latest"
+        self.coingecko_url = (
+            f"{stand_ins['coingecko'].url}/api/v3/simple/price"
+            "?ids=ethereum&vs_currencies=usd"
+        )
+        self.price_url = f"{stand_ins['zero_ex'].url}/swap/v1/price"
+        self.quote_url = f"{stand_ins['zero_ex'].url}/swap/v1/quote"
+        self.slack_url = stand_ins["slack"].url
+        self.labels = {
+            address: label for label, (address, _) in main.KNOWN_ASSETS.items()
+        }
+        self.references = {
+            label: reference for label, (_, reference) in main.KNOWN_ASSETS.items()
+        }
+
+    def get_amkt_nav(self):
+        # Contract objects were built on every call
+        vault = self.mainnet_w3.eth.contract(
+            address=self.main.VAULT_ADDRESS, abi=VIRTUAL_UNITS_ABI
+        )
+        units = {
+            self.labels[address]: amount
+            for address, amount in vault.functions.virtualUnits().call()
+        }
+        response = requests.get(
+            self.cmc_url,
+            headers={"X-CMC_PRO_API_KEY": "bench"},
+            params={"symbol": ",".join(MARKET_PRICES)},
+        )
+        market_data = {
+            asset["symbol"]: {"price": asset["quote"]["USD"]["price"]}
+            for asset in response.json()["data"].values()
+        }
+        nav = 0.0
+        for label, amount in units.items():
+            value = amount / 10 ** BASKET[label][1]
+            value *= market_data[self.references[label]]["price"]
+            if label == "WSTETH":
+                wsteth = self.mainnet_w3.eth.contract(
+                    address=self.main.WSTETH_ADDRESS, abi=STETH_BY_WSTETH_ABI
+                )
+                value *= wsteth.functions.getStETHByWstETH(10**18).call() / 10**18
+            nav += value
+        return nav
+
+    def get_eth_usd_price(self):
+        return requests.get(self.coingecko_url).json()["ethereum"]["usd"]
+
+    def get_0x_price(self, sell_amount):
+        params = {
+            "sellToken": self.main.AMKT_TOKEN_ADDRESS,
+            "buyToken": self.main.ETH_TOKEN_ADDRESS,
+            "sellAmount": sell_amount,
+            "takerAddress": BENCH_ADDRESS,
+        }
+        headers = {"0x-api-key": "bench"}
+        return requests.get(self.price_url, params=params, headers=headers).json()
+
+    def validate_inventory(self, nav, eth_price, premium_or_discount):
+        eth_balance = self.w3.from_wei(self.w3.eth.get_balance(BENCH_ADDRESS), "ether")
+        amkt = self.w3.eth.contract(
+            address=self.main.AMKT_TOKEN_ADDRESS, abi=self.main.AMKT_BALANCE_ABI
+        )
+        amkt_balance = amkt.functions.balanceOf(BENCH_ADDRESS).call() / 10**18
+        amount = self.main.AMKT_AMOUNT
+        if premium_or_discount > 0:
+            return amkt_balance >= amount
+        return eth_balance >= amount * nav / eth_price
+
+    def post_slack(self, message):
+        requests.post(
+            self.slack_url,
+            headers={"Content-type": "application/json"},
+            data=json.dumps({"text": message}),
+        )
+
+    def start_trade(self, sell_amount):
+        # Returns when the transaction was broadcast; the receipt wait and the
+        # closing Slack post still block the check, as they did
+        self.post_slack(f"Sell amount: {sell_amount}")
+        params = {
+            "sellToken": self.main.AMKT_TOKEN_ADDRESS,
+            "buyToken": self.main.ETH_TOKEN_ADDRESS,
+            "sellAmount": sell_amount,
+            "takerAddress": BENCH_ADDRESS,
+            "slippagePercentage": self.main.SLIPPAGE_PERCENTAGE,
+        }
+        headers = {"0x-api-key": "bench"}
+        quote = requests.get(self.quote_url, params=params, headers=headers).json()
+        transaction = {
+            "from": BENCH_ADDRESS,
+            "to": Web3.to_checksum_address(quote["to"]),
+            "data": quote["data"],
+            "value": int(quote["value"]),
+            "gas": int(quote["gas"]),
+            "gasPrice": int(quote["gasPrice"]),
+            "nonce": self.w3.eth.get_transaction_count(BENCH_ADDRESS),
+        }
+        signed = self.w3.eth.account.sign_transaction(transaction, BENCH_PRIVATE_KEY)
+        txn_hash = self.w3.eth.send_raw_transaction(signed.rawTransaction)
+        broadcast_at = time.perf_counter()
+        self.w3.eth.wait_for_transaction_receipt(txn_hash)
+        self.post_slack(f"Transaction sent! Hash: {txn_hash.hex()}")
+        return broadcast_at
+
+
+def sequential_check(baseline):
+    # One iteration of the original main loop
+    amount_wei = int(baseline.main.AMKT_AMOUNT * 10**18)
+    nav = baseline.get_amkt_nav()
+    eth_price = baseline.get_eth_usd_price()
+    price_info = baseline.get_0x_price(amount_wei)
+    gas_cost_usd = (
+        int(price_info["estimatedGas"]) * int(price_info["gasPrice"]) / 10**18
+    ) * eth_price
+    amkt_price_usd = float(price_info["price"]) * eth_price
+    premium_or_discount = (amkt_price_usd - nav) / nav * 100
+    if not baseline.validate_inventory(nav, eth_price, premium_or_discount):
+        return None
+    if abs(premium_or_discount) < float(price_info["estimatedPriceImpact"]):
+        return None
+    if amkt_price_usd <= nav + gas_cost_usd:
+        return None
+    decided_at = time.perf_counter()
+    return decided_at, baseline.start_trade(amount_wei)
+
+
+async def concurrent_check(main):
+    # One cycle of run(): concurrent snapshot with a speculative quote, trade
+    snapshot = await main.gather_snapshot()
+    _, trade = main.evaluate_snapshot(snapshot)
+    if trade is None:
+        return None
+    decided_at = time.perf_counter()
+    await main.execute_trade(trade, snapshot.quotes.get(trade))
+    return decided_at, time.perf_counter()
+
+
+async def settle_receipts(main):
+    # Lets the receipt land so the next check is not skipped as pending. In
+    # production the next block is this far away anyway, so it is off the clock
+    await asyncio.gather(*main.receipt_tracker.pending.values())
+
+
+def summarize(name, checks, elapsed, check_times, broadcast_times):
+    print(f"{name}: {checks} checks, {len(broadcast_times)} trades in {elapsed:.2f}s")
+    print(f"  throughput:            {checks / elapsed:8.2f} checks/s")
+    for label, times in (
+        ("check-to-broadcast", check_times),
+        ("decision-to-broadcast", broadcast_times),
+    ):
+        if times:
+            p50, p99 = np.percentile(np.array(times) * 1000, [50, 99])
+            print(f"  {label + ':':<22} p50 {p50:8.1f} ms   p99 {p99:8.1f} ms")
+
+
+async def run_benchmark(main, baseline, checks):
+    results = {}
+    for name, check, settle in (
+        ("sequential", lambda: main.run_io(sequential_check, baseline), None),
+        ("concurrent", lambda: concurrent_check(main), settle_receipts),
+    ):
+        check_times, broadcast_times = [], []
+        off_clock = 0.0
+        started_at = time.perf_counter()
+        for _ in range(checks):
+            check_started_at = time.perf_counter()
+            timings = await check()
+            if timings is not None:
+                decided_at, broadcast_at = timings
+                check_times.append(broadcast_at - check_started_at)
+                broadcast_times.append(broadcast_at - decided_at)
+            if settle:
+                settle_started_at = time.perf_counter()
+                await settle(main)
+                off_clock += time.perf_counter() - settle_started_at
+        elapsed = time.perf_counter() - started_at - off_clock
+        results[name] = (elapsed, check_times, broadcast_times)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bot end to end")
+    parser.add_argument("--checks", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    stand_ins = start_stand_ins(args.latency_ms / 1000, args.jitter_ms / 1000)
+    bot = import_bot(stand_ins)
+    seed_chain_state(bot, stand_ins)
+    bot.slack_notifier.start()
+
+    # The bot logs every step; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = asyncio.run(run_benchmark(bot, Baseline(bot, stand_ins), args.checks))
+
+    print(
+        f"Stand-in latency {args.latency_ms:g} ms + up to {args.jitter_ms:g} ms "
+        "jitter per request"
+    )
+    for name, (elapsed, check_times, broadcast_times) in results.items():
+        summarize(name, args.checks, elapsed, check_times, broadcast_times)
+    print("Requests served:")
+    for name, stand_in in stand_ins.items():
+        print(f"  {name + ':':<22} {sum(stand_in.request_counts.values()):8}")
+
+    bot.slack_notifier.close()
+    for stand_in in stand_ins.values():
+        stand_in.stop()
+
+
+if __name__ == "__main__":
+    main()
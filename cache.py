@@ -0,0 +1,66 @@
+import time
+
+from web3 import Web3
+
+
+class TTLCache:
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self.entries[key]
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        self.entries[key] = (value, time.monotonic() + ttl)
+
+    def invalidate(self, key):
+        self.entries.pop(key, None)
+
+
+def address_topic(address):
+    return "0x" + "00" * 12 + Web3.to_checksum_address(address)[2:].lower()
+
+
+class LogWatcher:
+    # Maps cache keys to the log filters that mean their value changed on chain.
+    # poll() scans every block since the previous poll and reports which keys saw
+    # a matching log, so cached values are dropped as soon as the chain moves them
+    def __init__(self, w3, filters, poll_interval):
+        self.w3 = w3
+        self.filters = filters
+        self.poll_interval = poll_interval
+        self.last_block = None
+        self.last_poll = 0.0
+
+    def due(self):
+        return time.monotonic() - self.last_poll >= self.poll_interval
+
+    def poll(self, block_number):
+        self.last_poll = time.monotonic()
+        if self.last_block is None or block_number <= self.last_block:
+            self.last_block = max(self.last_block or 0, block_number)
+            return set()
+
+        changed = set()
+        for key, key_filters in self.filters.items():
+            for log_filter in key_filters:
+                logs = self.w3.eth.get_logs(
+                    {
+                        **log_filter,
+                        "fromBlock": self.last_block + 1,
+                        "toBlock": block_number,
+                    }
+                )
+                if logs:
+                    print(f"{len(logs)} new log(s) invalidate cached {key}")
+                    changed.add(key)
+                    break
+        self.last_block = block_number
+        return changed
@@ -0,0 +1,64 @@
+import asyncio
+import contextlib
+import threading
+
+
+class NonceManager:
+    # Hands out nonces locally so signing never waits on eth_getTransactionCount.
+    # The chain is only asked again after a failure leaves the local count in doubt
+    def __init__(self, w3, address):
+        self.w3 = w3
+        self.address = address
+        self.lock = threading.Lock()
+        self.next_nonce = None
+
+    def sync(self):
+        with self.lock:
+            self.next_nonce = self.w3.eth.get_transaction_count(self.address, "pending")
+
+    def next(self):
+        with self.lock:
+            if self.next_nonce is None:
+                self.next_nonce = self.w3.eth.get_transaction_count(
+                    self.address, "pending"
+                )
+            nonce = self.next_nonce
+            self.next_nonce += 1
+            return nonce
+
+    def reset(self):
+        with self.lock:
+            self.next_nonce = None
+
+
+class ReceiptTracker:
+    # Waits for receipts in the background so the loop can keep scanning while
+    # transactions confirm
+    def __init__(self, w3, executor, on_receipt, on_error, timeout=120, span=None):
+        self.w3 = w3
+        self.executor = executor
+        self.on_receipt = on_receipt
+        self.on_error = on_error
+        self.timeout = timeout
+        # Optional context manager factory used to time the wait
+        self.span = span or (lambda stage: contextlib.nullcontext())
+        self.pending = {}
+
+    def track(self, txn_hash):
+        self.pending[txn_hash] = asyncio.create_task(self._wait(txn_hash))
+
+    async def _wait(self, txn_hash):
+        loop = asyncio.get_running_loop()
+        try:
+            with self.span("receipt"):
+                receipt = await loop.run_in_executor(
+                    self.executor,
+                    lambda: self.w3.eth.wait_for_transaction_receipt(
+                        txn_hash, timeout=self.timeout
+                    ),
+                )
+            self.on_receipt(txn_hash, receipt)
+        except Exception as e:
+            self.on_error(txn_hash, e)
+        finally:
+            del self.pending[txn_hash]
@@ -0,0 +1,48 @@
+class GasModel:
+    # Rolling estimate of what a swap costs on one chain: the L2 base fee plus a
+    # priority tip per unit of gas, and on OP-stack chains the L1 data fee for
+    # posting the transaction. Samples come from the venue's balance multicall,
+    # so costing a trade adds no round trip. Estimates take the higher of the
+    # latest sample and the smoothed one, so a fee spike is priced in at once
+    # while a dip has to last before it is trusted
+    def __init__(self, priority_fee, alpha=0.3):
+        self.priority_fee = priority_fee
+        self.alpha = alpha
+        self.block = None
+        self.base_fee = None
+        self.base_fee_ewma = None
+        self.l1_fee = 0
+        self.l1_fee_ewma = 0.0
+
+    def _smooth(self, ewma, sample):
+        return sample if ewma is None else ewma + self.alpha * (sample - ewma)
+
+    def update(self, block_number, base_fee, l1_fee=None):
+        # Venues on the same chain sample the same block; count it once
+        if base_fee is None or block_number == self.block:
+            return
+        self.block = block_number
+        self.base_fee = base_fee
+        self.base_fee_ewma = self._smooth(self.base_fee_ewma, base_fee)
+        if l1_fee is not None:
+            self.l1_fee = l1_fee
+            self.l1_fee_ewma = self._smooth(self.l1_fee_ewma or None, l1_fee)
+
+    def ready(self):
+        return self.base_fee is not None
+
+    def gas_price(self):
+        # Expected price per unit of L2 gas, in wei
+        return int(max(self.base_fee, self.base_fee_ewma)) + self.priority_fee
+
+    def data_fee(self):
+        # Expected L1 data fee of one swap transaction, in wei
+        return int(max(self.l1_fee, self.l1_fee_ewma))
+
+    def fee_fields(self):
+        # EIP-1559 fees for a transaction sent now; the cap leaves room for the
+        # base fee to double before it is included
+        return {
+            "maxFeePerGas": 2 * self.base_fee + self.priority_fee,
+            "maxPriorityFeePerGas": self.priority_fee,
+        }
@@ -1,9 +1,32 @@
+import asyncio
+import contextvars
+import functools
 import requests
 import time
-import json
+import traceback
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from decimal import Decimal
+from requests.adapters import HTTPAdapter
 from web3 import Web3
+from web3.middleware import simple_cache_middleware
 import os
 from dotenv import load_dotenv
+from execution import NonceManager, ReceiptTracker
+from gas_model import GasModel
+from metrics import Counter, Telemetry
+from cache import LogWatcher, TTLCache, address_topic
+from nav_engine import NavEngine
+from registry import AssetRegistry
+from notifier import SlackNotifier
+from rpc_pool import PooledHTTPProvider, parse_urls
+from price_feed import PriceFeed, PriceTable
+from quota import HIGH, LOW, ApiScheduler
+from recorder import MarketRecorder, ladder_column
+from scheduler import BlockScheduler
+from sizing import TradeSizer, amkt_price_usd
+from multicall import MULTICALL3_ADDRESS, Multicall, make_call
 
 # Load environment variables from .env file
 load_dotenv()
@@ -15,6 +38,38 @@ ETH_ADDRESS = os.getenv("ETH_ADDRESS")
 NETWORK = os.getenv("NETWORK")
 SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL")
 CMC_PRO_API_KEY = os.getenv("CMC_PRO_API_KEY")
+# Optional overrides, e.g. to point both chains at a local anvil fork. Either can
+# be a comma-separated list; requests are spread and hedged across its endpoints
+RPC_URL = os.getenv("RPC_URL")
+MAINNET_RPC_URL = os.getenv(
+    "MAINNET_RPC_URL",
+    "https://rpc.ankr.com/eth,https://ethereum-rpc.publicnode.com,"
+    "https://eth.llamarpc.com",
+)
+MULTICALL3_ADDRESS = os.getenv("MULTICALL3_ADDRESS", MULTICALL3_ADDRESS)
+# Websocket RPC endpoint for newHeads; blocks are polled over HTTP when unset
+WS_RPC_URL = os.getenv("WS_RPC_URL")
+# Binance-style miniTicker stream for underlying prices; empty to use CMC only
+PRICE_STREAM_URL = os.getenv("PRICE_STREAM_URL", "wss://stream.binance.com:9443")
+# File caching the vault's underlying token metadata; empty to read it from chain
+# on every start
+ASSET_REGISTRY_PATH = os.getenv("ASSET_REGISTRY_PATH", "asset_registry.json")
+# Directory to record every check's snapshot to for backtest.py; unset to disable
+MARKET_LOG_DIR = os.getenv("MARKET_LOG_DIR")
+# API base URLs, overridable to run against the local stand-ins in standins.py
+ZEROX_API_URL = os.getenv("ZEROX_API_URL")
+CMC_API_URL = os.getenv("CMC_API_URL", "https://pro-api.coinmarketcap.com")
+# Local port for the Prometheus /metrics endpoint; empty to disable
+METRICS_PORT = os.getenv("METRICS_PORT", "9108")
+# File to append one JSON trace record per check to; unset to disable
+TRACE_LOG = os.getenv("TRACE_LOG")
+# Request budgets for the external APIs. 0x is limited per second; CoinMarketCap
+# bills credits per day (one per quotes request for up to 100 symbols)
+ZEROX_REQUESTS_PER_SECOND = float(os.getenv("ZEROX_REQUESTS_PER_SECOND", "5"))
+CMC_CREDITS_PER_DAY = float(os.getenv("CMC_CREDITS_PER_DAY", "333"))
+# Venues to scan each check as comma-separated <network>:<quote asset>, e.g.
+# "base:ETH,base:USDC"; defaults to AMKT/ETH on the selected network
+SCAN_VENUES = os.getenv("SCAN_VENUES")
 
 # Network configurations
 network_settings = {
@@ -24,7 +79,30 @@ network_settings = {
         "ZEROX_QUOTE_ENDPOINT": "https://base.api.0x.org/swap/v1/quote",
         "ETH_TOKEN_ADDRESS": "0xEeeeeEeeeEeEeeEeEeEeeEEEeeeeEeeeeeeeEEeE",
         "AMKT_TOKEN_ADDRESS": "0x13F4196cC779275888440b3000AE533BbBbC3166",
-        "HTTP_PROVIDER_URL": "https://mainnet.base.org",
+        "CHAIN_ID": 8453,
+        # OP-stack predeploy that prices the L1 data fee of a transaction
+        "GAS_PRICE_ORACLE": "0x420000000000000000000000000000000000000F",
+        # Assets AMKT is traded against. REFERENCE is the market data symbol that
+        # prices the asset in USD; None marks a dollar stablecoin
+        "QUOTE_TOKENS": {
+            "ETH": {
+                "ADDRESS": "0xEeeeeEeeeEeEeeEeEeEeeEEEeeeeEeeeeeeeEEeE",
+                "DECIMALS": 18,
+                "REFERENCE": "ETH",
+                "NATIVE": True,
+            },
+            "USDC": {
+                "ADDRESS": "0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913",
+                "DECIMALS": 6,
+                "REFERENCE": None,
+                "NATIVE": False,
+            },
+        },
+        "HTTP_PROVIDER_URLS": [
+            "https://mainnet.base.org",
+            "https://base-rpc.publicnode.com",
+            "https://base.llamarpc.com",
+        ],
     },
     # Additional networks can be added here
 }
@@ -34,302 +112,470 @@ current_network_settings = network_settings.get(NETWORK)
 if not current_network_settings:
     raise ValueError(f"Unsupported network: {NETWORK}")
 
+
+def zero_ex_endpoints(settings):
+    if ZEROX_API_URL:
+        return f"{ZEROX_API_URL}/swap/v1/price", f"{ZEROX_API_URL}/swap/v1/quote"
+    return settings["ZEROX_PRICE_ENDPOINT"], settings["ZEROX_QUOTE_ENDPOINT"]
+
+
 # Update constants with network-specific values
-ZEROX_PRICE_ENDPOINT = current_network_settings["ZEROX_PRICE_ENDPOINT"]
-ZEROX_QUOTE_ENDPOINT = current_network_settings["ZEROX_QUOTE_ENDPOINT"]
 ETH_TOKEN_ADDRESS = current_network_settings["ETH_TOKEN_ADDRESS"]
 AMKT_TOKEN_ADDRESS = current_network_settings["AMKT_TOKEN_ADDRESS"]
-w3 = Web3(Web3.HTTPProvider(current_network_settings["HTTP_PROVIDER_URL"]))
-mainnet_w3 = Web3(Web3.HTTPProvider("https://rpc.ankr.com/eth"))
 
-# Other constants
-COINGECKO_ETH_PRICE_ENDPOINT = (
-    "https://api.coingecko.com/api/v3/simple/price?ids=ethereum&vs_currencies=usd"
+scan_venues = [
+    tuple(venue.strip().split(":"))
+    for venue in (SCAN_VENUES or f"{NETWORK}:ETH").split(",")
+    if venue.strip()
+]
+for network_name, quote_symbol in scan_venues:
+    if quote_symbol not in network_settings.get(network_name, {}).get(
+        "QUOTE_TOKENS", {}
+    ):
+        raise ValueError(f"Unsupported venue: {network_name}:{quote_symbol}")
+if MARKET_LOG_DIR and (NETWORK, "ETH") not in scan_venues:
+    # The market log records AMKT/ETH on the selected network and nothing else
+    raise ValueError(f"MARKET_LOG_DIR needs {NETWORK}:ETH in SCAN_VENUES")
+# The selected network drives the block scheduler and comes first
+scan_networks = [NETWORK] + sorted(
+    {network_name for network_name, _ in scan_venues} - {NETWORK}
 )
-CHECK_INTERVAL = 120  # Interval for checking arbitrage opportunities in seconds
-AMKT_AMOUNT = 2  # Amount of AMKT to trade
-SLIPPAGE_PERCENTAGE = "0.003"  # Slippage percentage for 0x trades
 
-ADDRESSES = {
-    "WBTC": "0x2260FAC5E5542a773Aa44fBCfeDf7C193bc2C599",
-    "WSTETH": "0x7f39C581F595B53c5cb19bD0b3f8dA6c935E2Ca0",
-    "MATIC": "0x7D1AfA7B718fb893dB30A3aBc0Cfc608AaCfeBB0",
-    "SHIB": "0x95aD61b0a150d79219dCF64E1E6Cc01f0B64C4cE",
-    "LINK": "0x514910771AF9Ca656af840dff83E8264EcF986CA",
-    "UNI": "0x1f9840a85d5aF5bf1D1762F925BDADdC4201F984",
-    "LDO": "0x5A98FcBEA516Cf06857215779Fd812CA3beF1B32",
-    "MNT": "0x3c3a81e81dc49A522A592e7622A7E711c06bf354",
-    "CRO": "0xA0b73E1Ff0B80914AB6fe0444E65848C4C34450b",
-    "QNT": "0x4a220E6096B25EADb88358cb44068A3248254675",
-    "ARB": "0xB50721BCf8d664c30412Cfbc6cf7a15145234ad1",
-    "MKR": "0x9f8F72aA9304c8B593d555F12eF6589cC3A579A2",
-    "AAVE": "0x7Fc66500c84A76Ad7e9c93437bFc5Ac33E2DDaE9",
-    "GRT": "0xc944E90C64B2c07662A292be6244BDf05Cda44a7",
-    "WORMHOLE_BNB": "0x418D75f65a02b3D53B2418FB8E1fe493759c7605",
-    "WORMHOLE_SOL": "0xD31a59c85aE9D8edEFeC411D448f90841571b89c",
-    "WORMHOLE_AVAX": "0x85f138bfEE4ef8e540890CFb48F620571d67Eda3",
-    "21CO_BNB": "0x1bE9d03BfC211D83CFf3ABDb94A75F9Db46e1334",
-    "21CO_SOL": "0xb80a1d87654BEf7aD8eB6BBDa3d2309E31D4e598",
-    "21CO_AVAX": "0x399508A43d7E2b4451cd344633108b4d84b33B03",
-    "ASTETH": "0x27C2B9fd547EAd2c05C305BeE2399A55811257c2",
-    "21CO_XRP": "0x0d3bd40758dF4F79aaD316707FcB809CD4815Ffe",
-    "21CO_ADA": "0x9c05d54645306d4C4EAd6f75846000E1554c0360",
-    "21CO_DOGE": "0xD2aEE1CE2b4459dE326971DE036E82f1318270AF",
-    "21CO_DOT": "0xF4ACCD20bFED4dFFe06d4C85A7f9924b1d5dA819",
-    "21CO_LTC": "0x9F2825333aa7bC2C98c061924871B6C016e385F3",
-    "21CO_BCH": "0xFf4927e04c6a01868284F5C3fB9cba7F7ca4aeC0",
-    "STETH": "0xae7ab96520DE3A18E5e111B5EaAb095312D7fE84",
-}
+# One pooled keep-alive session shared by every HTTP API and both RPC providers,
+# sized so a full concurrent gather never waits for a free connection
+HTTP_POOL_SIZE = 16
+http_session = requests.Session()
+http_session.mount(
+    "https://",
+    HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE),
+)
+http_session.mount(
+    "http://", HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+)
+
+# Stage timings, counters and per-check traces
+telemetry = Telemetry(TRACE_LOG)
+api_events = telemetry.registry.register(
+    Counter(
+        "amkt_bot_api_events_total",
+        "External API requests, retries, coalesced and shed requests and errors",
+        ["api", "event"],
+    )
+)
+
+# Every 0x and CMC request is spent from a token bucket. Low priority requests
+# (ladder probes away from the threshold, refreshes of stale but usable prices)
+# are shed once the bucket drops to its reserve, which is kept for the
+# reference quote, firm quotes and probes of venues close to a trade
+zero_ex_api = ApiScheduler(
+    http_session,
+    "0x",
+    rate=ZEROX_REQUESTS_PER_SECOND,
+    burst=2 * ZEROX_REQUESTS_PER_SECOND,
+    reserve=ZEROX_REQUESTS_PER_SECOND,
+    events=api_events,
+)
+cmc_api = ApiScheduler(
+    http_session,
+    "cmc",
+    rate=CMC_CREDITS_PER_DAY / 86400,
+    burst=5,
+    reserve=2,
+    events=api_events,
+)
+
+
+def network_rpc_urls(network_name):
+    # <NETWORK>_RPC_URL overrides any network; RPC_URL the selected one
+    override = os.getenv(f"{network_name.upper()}_RPC_URL")
+    if override is None and network_name == NETWORK:
+        override = RPC_URL
+    if override:
+        return parse_urls(override)
+    return network_settings[network_name]["HTTP_PROVIDER_URLS"]
 
-DECIMALS = {
-    "WBTC": 8,
-    "WSTETH": 18,
-    "MATIC": 18,
-    "SHIB": 18,
-    "LINK": 18,
-    "UNI": 18,
-    "LDO": 18,
-    "MNT": 18,
-    "CRO": 18,
-    "QNT": 18,
-    "ARB": 18,
-    "MKR": 18,
-    "AAVE": 18,
-    "GRT": 18,
-    "WORMHOLE_BNB": 18,
-    "WORMHOLE_SOL": 9,
-    "WORMHOLE_AVAX": 18,
-    "21CO_BNB": 8,
-    "21CO_SOL": 9,
-    "21CO_AVAX": 18,
-    "ASTETH": 18,
-    "21CO_XRP": 6,
-    "21CO_ADA": 6,
-    "21CO_DOGE": 8,
-    "21CO_DOT": 10,
-    "21CO_LTC": 8,
-    "21CO_BCH": 8,
-    "STETH": 18,
+
+def connect(urls):
+    web3 = Web3(PooledHTTPProvider(urls, http_session, span=telemetry.span))
+    # web3 re-fetches eth_chainId to validate every eth_call; cache it so a
+    # batched read costs exactly one round trip
+    web3.middleware_onion.add(simple_cache_middleware)
+    return web3
+
+
+network_w3s = {
+    network_name: connect(network_rpc_urls(network_name))
+    for network_name in scan_networks
 }
+w3 = network_w3s[NETWORK]
+mainnet_w3 = connect(parse_urls(MAINNET_RPC_URL))
 
+# Batch every per-cycle read on each chain into a single aggregate3 call
+mainnet_multicall = Multicall(mainnet_w3, MULTICALL3_ADDRESS)
 
-# Helper functions
-def convert_units_to_numbers(units):
-    return {asset: units[asset] / (10 ** DECIMALS[asset]) for asset in units}
+# Worker threads used to run the blocking fetches of a cycle concurrently
+io_executor = ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE)
 
+slack_notifier = SlackNotifier(http_session, SLACK_WEBHOOK_URL)
 
-def convert_address_to_symbol(val):
-    for key, value in ADDRESSES.items():
-        if val == value:
-            return key
+# Other constants
+CHECK_INTERVAL = 120  # Longest wait between quiet checks in seconds
+MIN_CHECK_INTERVAL = 2  # Shortest wait between checks (one Base block) in seconds
+CHECK_BACKOFF_FACTOR = 2  # Wait growth per check that sees no change
+BLOCK_POLL_INTERVAL = 1  # eth_blockNumber polling period in seconds
+PRICE_MOVE_THRESHOLD = 0.002  # Underlying price move that triggers a check
+PREMIUM_CHANGE_THRESHOLD = 0.05  # Premium move (% points) that resets the wait
+PRICE_MAX_AGE = 60  # Oldest usable price before a REST refresh, in seconds
+PRICE_HARD_MAX_AGE = 600  # Oldest price a check may use at all, in seconds
 
+# Reference assets priced for the NAV
+MARKET_SYMBOLS = [
+    "BTC",
+    "ETH",
+    "BNB",
+    "XRP",
+    "SOL",
+    "ADA",
+    "DOGE",
+    "LINK",
+    "AVAX",
+    "MATIC",
+    "DOT",
+    "LTC",
+    "SHIB",
+    "BCH",
+    "UNI",
+]
+AMKT_AMOUNT = 2  # Reference amount of AMKT quoted for the premium/discount
+AMKT_SIZE_LADDER = [0.5, 1, 2, 4, 8]  # AMKT sizes quoted each check to size trades
+SIZE_PROBE_TTL = 2  # Reuse a size's 0x price for this many seconds (one Base block)
+SIZE_FALLBACK_AGE = 5 * SIZE_PROBE_TTL  # Oldest price standing in for a shed probe
+SLIPPAGE_PERCENTAGE = "0.003"  # Slippage percentage for 0x trades
+SPECULATIVE_QUOTE_THRESHOLD = 0.5  # Reference size edge (%) that prefetches a quote
+SPECULATIVE_PROFIT_SHARE = 0.9  # Share of the best profit a prefetched size may trade
+URGENT_PREMIUM_MARGIN = 0.5  # Edge (% points) below tradeable that quotes all sizes
+MIN_PROFIT_USD = 0.5  # Expected net profit a trade has to clear
+PRIORITY_FEE = 10**6  # Priority tip per unit of gas in wei (0.001 gwei)
+SWAP_TX_SIZE = 600  # Unsigned size in bytes of a 0x swap, for the L1 data fee
+RECEIPT_TIMEOUT = 120  # Seconds to wait for a transaction receipt
 
-def get_amkt_nav():
-    current_units = get_current_units()
-    current_units_numbers = convert_units_to_numbers(current_units)
-    market_data = get_market_data()
-    nav = sum(
-        calculate_implementation_value(asset, current_units_numbers[asset], market_data)
-        for asset in current_units_numbers
+VAULT_ADDRESS = "0xf3bCeDaB2998933c6AAD1cB31430D8bAb329dD8C"
+WSTETH_ADDRESS = "0x7f39C581F595B53c5cb19bD0b3f8dA6c935E2Ca0"
+STETH_ADDRESS = "0xae7ab96520DE3A18E5e111B5EaAb095312D7fE84"
+
+# Cached mainnet state and the logs that invalidate it. The basket moves on fee
+# mints and on rebalances, which shift underlyings in and out of the vault; the
+# wstETH rate moves when Lido's oracle report rebases stETH
+VIRTUAL_UNITS_TTL = 3600  # Upper bound on basket age in seconds
+STETH_RATE_TTL = 3600  # Upper bound on wstETH rate age in seconds
+LOG_POLL_INTERVAL = 12  # Mainnet block time in seconds
+TRANSFER_TOPIC = Web3.to_hex(Web3.keccak(text="Transfer(address,address,uint256)"))
+VAULT_FEE_MINTED_TOPIC = Web3.to_hex(
+    Web3.keccak(text="VaultFeeMinted(address,uint256)")
+)
+TOKEN_REBASED_TOPIC = Web3.to_hex(
+    Web3.keccak(
+        text="TokenRebased(uint256,uint256,uint256,uint256,uint256,uint256,uint256)"
     )
-    return nav
+)
+
+state_cache = TTLCache()
+log_watcher = LogWatcher(
+    mainnet_w3,
+    {
+        "virtual_units": [
+            {"address": VAULT_ADDRESS, "topics": [VAULT_FEE_MINTED_TOPIC]},
+            {"topics": [TRANSFER_TOPIC, address_topic(VAULT_ADDRESS)]},
+            {"topics": [TRANSFER_TOPIC, None, address_topic(VAULT_ADDRESS)]},
+        ],
+        "steth_per_wsteth": [
+            {"address": STETH_ADDRESS, "topics": [TOKEN_REBASED_TOPIC]},
+        ],
+    },
+    LOG_POLL_INTERVAL,
+)
+
+AMKT_BALANCE_ABI = [
+    {
+        "constant": True,
+        "inputs": [{"name": "_owner", "type": "address"}],
+        "name": "balanceOf",
+        "outputs": [{"name": "balance", "type": "uint256"}],
+        "payable": False,
+        "stateMutability": "view",
+        "type": "function",
+    }
+]
+
+# Label and reference market asset of each known underlying. Decimals are read
+# from chain; an underlying missing here is priced off its own token symbol
+KNOWN_ASSETS = {
+    "WBTC": ("0x2260FAC5E5542a773Aa44fBCfeDf7C193bc2C599", "BTC"),
+    # Scaled by the live stETH per wstETH rate
+    "WSTETH": ("0x7f39C581F595B53c5cb19bD0b3f8dA6c935E2Ca0", "ETH"),
+    "MATIC": ("0x7D1AfA7B718fb893dB30A3aBc0Cfc608AaCfeBB0", "MATIC"),
+    "SHIB": ("0x95aD61b0a150d79219dCF64E1E6Cc01f0B64C4cE", "SHIB"),
+    "LINK": ("0x514910771AF9Ca656af840dff83E8264EcF986CA", "LINK"),
+    "UNI": ("0x1f9840a85d5aF5bf1D1762F925BDADdC4201F984", "UNI"),
+    "LDO": ("0x5A98FcBEA516Cf06857215779Fd812CA3beF1B32", "LDO"),
+    "MNT": ("0x3c3a81e81dc49A522A592e7622A7E711c06bf354", "MNT"),
+    "CRO": ("0xA0b73E1Ff0B80914AB6fe0444E65848C4C34450b", "CRO"),
+    "QNT": ("0x4a220E6096B25EADb88358cb44068A3248254675", "QNT"),
+    "ARB": ("0xB50721BCf8d664c30412Cfbc6cf7a15145234ad1", "ARB"),
+    "MKR": ("0x9f8F72aA9304c8B593d555F12eF6589cC3A579A2", "MKR"),
+    "AAVE": ("0x7Fc66500c84A76Ad7e9c93437bFc5Ac33E2DDaE9", "AAVE"),
+    "GRT": ("0xc944E90C64B2c07662A292be6244BDf05Cda44a7", "GRT"),
+    "WORMHOLE_BNB": ("0x418D75f65a02b3D53B2418FB8E1fe493759c7605", "BNB"),
+    "WORMHOLE_SOL": ("0xD31a59c85aE9D8edEFeC411D448f90841571b89c", "SOL"),
+    "WORMHOLE_AVAX": ("0x85f138bfEE4ef8e540890CFb48F620571d67Eda3", "AVAX"),
+    "21CO_BNB": ("0x1bE9d03BfC211D83CFf3ABDb94A75F9Db46e1334", "BNB"),
+    "21CO_SOL": ("0xb80a1d87654BEf7aD8eB6BBDa3d2309E31D4e598", "SOL"),
+    "21CO_AVAX": ("0x399508A43d7E2b4451cd344633108b4d84b33B03", "AVAX"),
+    "ASTETH": ("0x27C2B9fd547EAd2c05C305BeE2399A55811257c2", "ETH"),
+    "21CO_XRP": ("0x0d3bd40758dF4F79aaD316707FcB809CD4815Ffe", "XRP"),
+    "21CO_ADA": ("0x9c05d54645306d4C4EAd6f75846000E1554c0360", "ADA"),
+    "21CO_DOGE": ("0xD2aEE1CE2b4459dE326971DE036E82f1318270AF", "DOGE"),
+    "21CO_DOT": ("0xF4ACCD20bFED4dFFe06d4C85A7f9924b1d5dA819", "DOT"),
+    "21CO_LTC": ("0x9F2825333aa7bC2C98c061924871B6C016e385F3", "LTC"),
+    "21CO_BCH": ("0xFf4927e04c6a01868284F5C3fB9cba7F7ca4aeC0", "BCH"),
+    "STETH": ("0xae7ab96520DE3A18E5e111B5EaAb095312D7fE84", "STETH"),
+}
+
+# The vault's underlyings, loaded from ASSET_REGISTRY_PATH without any RPC and
+# extended from chain when the basket gains an asset
+asset_registry = AssetRegistry(
+    mainnet_multicall, VAULT_ADDRESS, KNOWN_ASSETS, ASSET_REGISTRY_PATH
+)
+asset_registry.load()
+if MARKET_LOG_DIR and not asset_registry.assets:
+    # The market log's columns follow the basket; read it before the log opens
+    asset_registry.refresh()
+
+
+def build_nav_engine():
+    return NavEngine(
+        asset_registry.addresses(),
+        asset_registry.decimals(),
+        asset_registry.references(),
+    )
+
+
+# Built at startup and again only when the basket changes; each cycle just feeds
+# it new units, rates and prices
+nav_engine = build_nav_engine()
+
+
+# Helper functions
+@telemetry.span("nav")
+def calculate_nav(virtual_units, market_data, steth_per_wsteth):
+    nav_engine.set_units(virtual_units)
+    if "WSTETH" in nav_engine.symbol_index:
+        nav_engine.set_multiplier("WSTETH", steth_per_wsteth / 10**18)
+    nav_engine.set_prices(market_data)
+    return nav_engine.nav()
 
 
-def get_eth_usd_price():
-    response = requests.get(COINGECKO_ETH_PRICE_ENDPOINT)
-    data = response.json()
-    print("Fetched ETH USD Price: ${}".format(data['ethereum']['usd']))
-    return data['ethereum']['usd']
+def get_amkt_nav():
+    _, virtual_units, steth_per_wsteth = get_mainnet_state()
+    market_data = get_market_data()
+    return calculate_nav(virtual_units, market_data, steth_per_wsteth)
 
 
-def get_current_units():
-    result = get_virtual_units()
+def update_basket(addresses, block_number):
+    # Only an underlying the registry has not seen costs an RPC round trip
+    global nav_engine
+    added = asset_registry.sync(addresses, block_number)
+    if added:
+        print(f"Basket gained {', '.join(a.label for a in added)}")
+        nav_engine = build_nav_engine()
+        price_feed.add_symbols(nav_engine.reference_symbols)
+        if market_recorder:
+            market_recorder.set_columns(market_log_columns())
 
-    units = {convert_address_to_symbol(item[0]): item[1] for item in result}
-    return units
 
+@telemetry.span("vault_state")
+def get_mainnet_state():
+    # Only touch mainnet once per block interval; in between, the cached basket and
+    # rate are current as of the last log scan
+    if log_watcher.due():
+        block_number = mainnet_w3.eth.block_number
+        for key in log_watcher.poll(block_number):
+            state_cache.invalidate(key)
+    block_number = log_watcher.last_block
 
-def get_virtual_units():
-    vault_address = "0xf3bCeDaB2998933c6AAD1cB31430D8bAb329dD8C"
-    vault_abi = '[{"inputs":[{"internalType":"contract IIndexToken","name":"_indexToken","type":"address"},{"internalType":"address","name":"_owner","type":"address"},{"internalType":"address","name":"_feeRecipient","type":"address"},{"internalType":"address","name":"_emergencyResponder","type":"address"},{"internalType":"uint256","name":"_inflationRate","type":"uint256"}],"stateMutability":"nonpayable","type":"constructor"},{"inputs":[],"name":"AMKTVaultEmergency","type":"error"},{"inputs":[],"name":"AMKTVaultFeeTooEarly","type":"error"},{"inputs":[],"name":"AMKTVaultFeeTooSmall","type":"error"},{"inputs":[],"name":"AMKTVaultInflationRateTooLarge","type":"error"},{"inputs":[{"internalType":"address","name":"who","type":"address"}],"name":"AMKTVaultOnly","type":"error"},{"inputs":[],"name":"AMKTVaultOnlyInvokers","type":"error"},{"inputs":[],"name":"VaultInvariant","type":"error"},{"inputs":[],"name":"VaultZeroCheck","type":"error"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"previousOwner","type":"address"},{"indexed":true,"internalType":"address","name":"newOwner","type":"address"}],"name":"OwnershipTransferStarted","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"previousOwner","type":"address"},{"indexed":true,"internalType":"address","name":"newOwner","type":"address"}],"name":"OwnershipTransferred","type":"event"},{"anonymous":false,"inputs":[{"indexed":false,"internalType":"address","name":"emergencyResponder","type":"address"}],"name":"VaultEmergencyResponderSet","type":"event"},{"anonymous":false,"inputs":[{"indexed":false,"internalType":"bool","name":"emergency","type":"bool"}],"name":"VaultEmergencySet","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"to","type":"address"},{"indexed":false,"internalType":"uint256","name":"amount","type":"uint256"}],"name":"VaultFeeMinted","type":"event"},{"anonymous":false,"inputs":[{"indexed":false,"internalType":"address","name":"feeRecipient","type":"address"}],"name":"VaultFeeRecipientSet","type":"event"},{"anonymous":false,"inputs":[{"indexed":false,"internalType":"uint256","name":"inflationRate","type":"uint256"}],"name":"VaultInflationRateSet","type":"event"},{"anonymous":false,"inputs":[{"indexed":false,"internalType":"address","name":"issuance","type":"address"}],"name":"VaultIssuanceSet","type":"event"},{"anonymous":false,"inputs":[{"indexed":false,"internalType":"address","name":"rebalancer","type":"address"}],"name":"VaultRebalancerSet","type":"event"},{"inputs":[],"name":"acceptOwnership","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[],"name":"emergency","outputs":[{"internalType":"bool","name":"","type":"bool"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"emergencyResponder","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"feeRecipient","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"indexToken","outputs":[{"internalType":"contract IIndexToken","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"inflationRate","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"invariantCheck","outputs":[],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"from","type":"address"},{"internalType":"uint256","name":"amount","type":"uint256"}],"name":"invokeBurn","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"components":[{"internalType":"address","name":"token","type":"address"},{"internalType":"address","name":"to","type":"address"},{"internalType":"uint256","name":"amount","type":"uint256"}],"internalType":"struct IVault.InvokeERC20Args[]","name":"args","type":"tuple[]"}],"name":"invokeERC20s","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"to","type":"address"},{"internalType":"uint256","name":"amount","type":"uint256"}],"name":"invokeMint","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"components":[{"internalType":"address","name":"token","type":"address"},{"internalType":"uint256","name":"virtualUnits","type":"uint256"}],"internalType":"struct IVault.SetNominalArgs[]","name":"args","type":"tuple[]"}],"name":"invokeSetNominals","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"_token","type":"address"}],"name":"isUnderlying","outputs":[{"internalType":"bool","name":"","type":"bool"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"issuance","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"lastKnownTimestamp","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"owner","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"pendingOwner","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"rebalancer","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"renounceOwnership","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"bool","name":"_emergency","type":"bool"}],"name":"setEmergency","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"_emergencyResponder","type":"address"}],"name":"setEmergencyResponder","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"_feeRecipient","type":"address"}],"name":"setFeeRecipient","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"uint256","name":"_inflationRate","type":"uint256"}],"name":"setInflationRate","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"_issuance","type":"address"}],"name":"setIssuance","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"_rebalancer","type":"address"}],"name":"setRebalancer","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"newOwner","type":"address"}],"name":"transferOwnership","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[],"name":"tryInflation","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[],"name":"underlying","outputs":[{"internalType":"address[]","name":"","type":"address[]"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"underlyingLength","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"token","type":"address"}],"name":"virtualUnits","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"virtualUnits","outputs":[{"components":[{"internalType":"address","name":"token","type":"address"},{"internalType":"uint256","name":"units","type":"uint256"}],"internalType":"struct TokenInfo[]","name":"","type":"tuple[]"}],"stateMutability":"view","type":"function"}]'
-    vault = mainnet_w3.eth.contract(address=vault_address, abi=vault_abi)
-    return vault.functions.virtualUnits().call()
+    virtual_units = state_cache.get("virtual_units")
+    steth_per_wsteth = state_cache.get("steth_per_wsteth")
+    calls = []
+    if virtual_units is None:
+        calls.append(
+            make_call(
+                VAULT_ADDRESS, "virtualUnits()", output_types=["(address,uint256)[]"]
+            )
+        )
+    if steth_per_wsteth is None:
+        calls.append(
+            make_call(
+                WSTETH_ADDRESS, "getStETHByWstETH(uint256)", [10**18], ["uint256"]
+            )
+        )
+    if calls:
+        # Pin the refill to the block the logs were scanned up to
+        _, values = mainnet_multicall.call(calls, block_number)
+        if virtual_units is None:
+            virtual_units = values.pop(0)
+            # Cached only once the registry knows every asset, so a failed sync is
+            # retried next check instead of leaving units the NAV cannot price
+            update_basket([address for address, _ in virtual_units], block_number)
+            state_cache.set("virtual_units", virtual_units, VIRTUAL_UNITS_TTL)
+        if steth_per_wsteth is None:
+            steth_per_wsteth = values.pop(0)
+            state_cache.set("steth_per_wsteth", steth_per_wsteth, STETH_RATE_TTL)
+    return block_number, virtual_units, steth_per_wsteth
 
 
-def get_steth_by_wsteth(_wstETH):
-    wstETH_address = "0x7f39C581F595B53c5cb19bD0b3f8dA6c935E2Ca0"
-    wstETH_abi = '[{"inputs":[{"internalType":"contract IStETH","name":"_stETH","type":"address"}],"stateMutability":"nonpayable","type":"constructor"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"owner","type":"address"},{"indexed":true,"internalType":"address","name":"spender","type":"address"},{"indexed":false,"internalType":"uint256","name":"value","type":"uint256"}],"name":"Approval","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"from","type":"address"},{"indexed":true,"internalType":"address","name":"to","type":"address"},{"indexed":false,"internalType":"uint256","name":"value","type":"uint256"}],"name":"Transfer","type":"event"},{"inputs":[],"name":"DOMAIN_SEPARATOR","outputs":[{"internalType":"bytes32","name":"","type":"bytes32"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"owner","type":"address"},{"internalType":"address","name":"spender","type":"address"}],"name":"allowance","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"spender","type":"address"},{"internalType":"uint256","name":"amount","type":"uint256"}],"name":"approve","outputs":[{"internalType":"bool","name":"","type":"bool"}],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"account","type":"address"}],"name":"balanceOf","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"decimals","outputs":[{"internalType":"uint8","name":"","type":"uint8"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"spender","type":"address"},{"internalType":"uint256","name":"subtractedValue","type":"uint256"}],"name":"decreaseAllowance","outputs":[{"internalType":"bool","name":"","type":"bool"}],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"uint256","name":"_wstETHAmount","type":"uint256"}],"name":"getStETHByWstETH","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"uint256","name":"_stETHAmount","type":"uint256"}],"name":"getWstETHByStETH","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"spender","type":"address"},{"internalType":"uint256","name":"addedValue","type":"uint256"}],"name":"increaseAllowance","outputs":[{"internalType":"bool","name":"","type":"bool"}],"stateMutability":"nonpayable","type":"function"},{"inputs":[],"name":"name","outputs":[{"internalType":"string","name":"","type":"string"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"owner","type":"address"}],"name":"nonces","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"owner","type":"address"},{"internalType":"address","name":"spender","type":"address"},{"internalType":"uint256","name":"value","type":"uint256"},{"internalType":"uint256","name":"deadline","type":"uint256"},{"internalType":"uint8","name":"v","type":"uint8"},{"internalType":"bytes32","name":"r","type":"bytes32"},{"internalType":"bytes32","name":"s","type":"bytes32"}],"name":"permit","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[],"name":"stETH","outputs":[{"internalType":"contract IStETH","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"stEthPerToken","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"symbol","outputs":[{"internalType":"string","name":"","type":"string"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"tokensPerStEth","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"totalSupply","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"recipient","type":"address"},{"internalType":"uint256","name":"amount","type":"uint256"}],"name":"transfer","outputs":[{"internalType":"bool","name":"","type":"bool"}],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"sender","type":"address"},{"internalType":"address","name":"recipient","type":"address"},{"internalType":"uint256","name":"amount","type":"uint256"}],"name":"transferFrom","outputs":[{"internalType":"bool","name":"","type":"bool"}],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"uint256","name":"_wstETHAmount","type":"uint256"}],"name":"unwrap","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"uint256","name":"_stETHAmount","type":"uint256"}],"name":"wrap","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"nonpayable","type":"function"},{"stateMutability":"payable","type":"receive"}]'
-    wstETH = mainnet_w3.eth.contract(address=wstETH_address, abi=wstETH_abi)
-    return wstETH.functions.getStETHByWstETH(_wstETH).call()
+@telemetry.span("balances")
+def get_venue_state(venue, block_identifier="latest"):
+    # Also samples the chain's fees for its gas model, in the same batch
+    network = venue.network
+    multicall = network.multicall
+    if venue.quote_native:
+        quote_call = multicall.get_eth_balance_call(ETH_ADDRESS)
+    else:
+        quote_call = make_call(
+            venue.quote_token, "balanceOf(address)", [ETH_ADDRESS], ["uint256"]
+        )
+    calls = [
+        quote_call,
+        make_call(network.amkt_token, "balanceOf(address)", [ETH_ADDRESS], ["uint256"]),
+        multicall.get_basefee_call(),
+    ]
+    if network.gas_price_oracle:
+        calls.append(
+            make_call(
+                network.gas_price_oracle,
+                "getL1FeeUpperBound(uint256)",
+                [SWAP_TX_SIZE],
+                ["uint256"],
+                allow_failure=True,
+            )
+        )
+    block_number, values = multicall.call(calls, block_identifier)
+    quote_balance_raw, amkt_balance_wei, base_fee = values[:3]
+    network.gas_model.update(block_number, base_fee, values[3] if values[3:] else None)
+    return (
+        block_number,
+        Decimal(quote_balance_raw) / 10**venue.quote_decimals,
+        amkt_balance_wei / 10**18,
+    )
 
 
-def get_cmc_data(symbols):
+@telemetry.span("cmc")
+def get_cmc_data(symbols, priority=HIGH):
     headers = {"X-CMC_PRO_API_KEY": CMC_PRO_API_KEY}
     params = {
         "symbol": ",".join(symbols),
     }
-    response = requests.get(
-        "https://pro-api.coinmarketcap.com/v1/cryptocurrency/quotes/latest",
-        headers=headers,
-        params=params,
+    return cmc_api.get_json(
+        f"{CMC_API_URL}/v1/cryptocurrency/quotes/latest",
+        params,
+        headers,
+        priority,
     )
-    return response.json()
 
 
+def get_cmc_prices(symbols, urgent=True):
+    data = get_cmc_data(symbols, HIGH if urgent else LOW)
+    return {
+        asset["symbol"]: asset["quote"]["USD"]["price"]
+        for asset in data["data"].values()
+    }
+
+
+@telemetry.span("market_data")
 def get_market_data():
-    # Combine old and new assets and remove duplicates
-    unique_assets = list(
-        set(
-            asset
-            for asset in [
-                "BTC",
-                "ETH",
-                "BNB",
-                "XRP",
-                "SOL",
-                "ADA",
-                "DOGE",
-                "LINK",
-                "AVAX",
-                "MATIC",
-                "DOT",
-                "LTC",
-                "SHIB",
-                "BCH",
-                "UNI",
-            ]
-        )
+    # Served from the streamed price table; only falls back to a CMC request when
+    # a price is missing or older than PRICE_MAX_AGE, at high priority while any
+    # venue is close to a trade
+    return price_feed.market_data(
+        urgent=any(venue.trade_sizer.urgent for venue in venues)
     )
-    # Fetch price and circulating supply for each asset
-    data = get_cmc_data(unique_assets)
-
-    market_data = {}
-    for asset in data["data"].values():
-        price = asset["quote"]["USD"]["price"]
-        circulating_supply = asset["circulating_supply"]
-        market_cap = price * circulating_supply
-        market_data[asset["symbol"]] = {
-            "price": price,
-            "market_cap": market_cap,
-        }
-    return market_data
-
-
-def get_0x_price(sell_token, buy_token, sell_amount):
+
+
+@telemetry.span("0x_price")
+def get_0x_price(
+    sell_token, buy_token, sell_amount, venue=None, priority=HIGH, buy_amount=None
+):
+    venue = venue or primary_venue
     params = {
         "sellToken": sell_token,
         "buyToken": buy_token,
         "sellAmount": sell_amount,
+        "buyAmount": buy_amount,
         "takerAddress": ETH_ADDRESS,
     }
     headers = {"0x-api-key": ZX_API_KEY}
-    response = requests.get(ZEROX_PRICE_ENDPOINT, params=params, headers=headers)
-    data = response.json()
+    data = zero_ex_api.get_json(venue.price_endpoint, params, headers, priority)
     estimated_gas = data.get("estimatedGas", 0)
     print(
-        "Fetched 0x price for {} AMKT with estimated gas: {}".format(
-            AMKT_AMOUNT, estimated_gas
+        "Fetched 0x price to {} {} AMKT with estimated gas: {}".format(
+            "sell" if sell_amount else "buy",
+            (sell_amount or buy_amount) / 10**18,
+            estimated_gas,
         )
     )
-    print(data)
     return data
 
 
-def calculate_implementation_value(implementation, numbers, market_data):
-    reference_data = {}
-    if implementation == "WSTETH":
-        reference_data = market_data["ETH"]
-        return (
-            numbers * reference_data["price"] * get_steth_by_wsteth(10**18) / (10**18)
-        )
-    if implementation == "WBTC":
-        reference_data = market_data["BTC"]
-    elif implementation == "ASTETH":
-        reference_data = market_data["ETH"]
-    elif implementation == "WORMHOLE_BNB":
-        reference_data = market_data["BNB"]
-    elif implementation == "WORMHOLE_SOL":
-        reference_data = market_data["SOL"]
-    elif implementation == "WORMHOLE_AVAX":
-        reference_data = market_data["AVAX"]
-    elif implementation == "21CO_XRP":
-        reference_data = market_data["XRP"]
-    elif implementation == "21CO_SOL":
-        reference_data = market_data["SOL"]
-    elif implementation == "21CO_ADA":
-        reference_data = market_data["ADA"]
-    elif implementation == "21CO_DOGE":
-        reference_data = market_data["DOGE"]
-    elif implementation == "21CO_DOT":
-        reference_data = market_data["DOT"]
-    elif implementation == "21CO_LTC":
-        reference_data = market_data["LTC"]
-    elif implementation == "21CO_BCH":
-        reference_data = market_data["BCH"]
-    elif implementation == "21CO_BNB":
-        reference_data = market_data["BNB"]
-    elif implementation == "21CO_SOL":
-        reference_data = market_data["21CO_SOL"]
-    elif implementation == "21CO_AVAX":
-        reference_data = market_data["AVAX"]
-    else:
-        reference_data = market_data[implementation]
-
-    return numbers * reference_data["price"]
+def inventory_limit(nav, quote_price, premium_or_discount, quote_balance, amkt_balance):
+    # Largest AMKT amount the current balances allow in the trade's direction
+    if premium_or_discount > 0:
+        return amkt_balance
+    return float(quote_balance) * quote_price / nav
 
 
-def validate_inventory(nav, eth_price, premium_or_discount):
+def validate_inventory(
+    nav,
+    quote_price,
+    premium_or_discount,
+    quote_balance,
+    amkt_balance,
+    amount=AMKT_AMOUNT,
+    quote_symbol="ETH",
+):
+    # quote_price is the USD price of the quote asset, ETH unless a venue says
+    # otherwise
     print("Checking inventory...")
-    eth_balance_wei = w3.eth.get_balance(ETH_ADDRESS)
-    eth_balance = w3.from_wei(eth_balance_wei, "ether")
-    eth_balance_usd = float(eth_balance) * eth_price
-    print(f"ETH Balance USD: {eth_balance_usd} USD")
-
-    amkt_contract = w3.eth.contract(
-        address=AMKT_TOKEN_ADDRESS,
-        abi=[
-            {
-                "constant": True,
-                "inputs": [{"name": "_owner", "type": "address"}],
-                "name": "balanceOf",
-                "outputs": [{"name": "balance", "type": "uint256"}],
-                "payable": False,
-                "stateMutability": "view",
-                "type": "function",
-            }
-        ],
-    )
-    amkt_balance_wei = amkt_contract.functions.balanceOf(ETH_ADDRESS).call()
-    amkt_balance = amkt_balance_wei / 10**18
+    quote_balance_usd = float(quote_balance) * quote_price
+    print(f"{quote_symbol} Balance USD: {quote_balance_usd} USD")
+
     amkt_balance_usd = float(amkt_balance) * nav
     print(f"AMKT Balance: {amkt_balance_usd} USD")
 
-    print("eth_balance: ", eth_balance)
+    print(f"{quote_symbol} balance: ", quote_balance)
     print("amkt_balance: ", amkt_balance)
-    print("eth amount: ", AMKT_AMOUNT * nav / eth_price)
+    print(f"{quote_symbol} amount: ", amount * nav / quote_price)
     if premium_or_discount > 0:
         # make sure there is enough AMKT balance to sell
-        if amkt_balance < AMKT_AMOUNT:
+        if amkt_balance < amount:
             print("Not enough AMKT balance to sell. Skipping trade...")
             return False
         else:
             print("Enough AMKT balance to sell. Proceeding with trade...")
     else:
-        # make sure there is enough ETH balance to buy AMKT
-        if eth_balance < AMKT_AMOUNT * nav / eth_price:
-            print("Not enough ETH balance to buy AMKT. Skipping trade...")
+        # make sure there is enough quote balance to buy AMKT
+        if quote_balance < amount * nav / quote_price:
+            print(f"Not enough {quote_symbol} balance to buy AMKT. Skipping trade...")
             return False
         else:
-            print("Enough ETH balance to buy AMKT. Proceeding with trade...")
+            print(
+                f"Enough {quote_symbol} balance to buy AMKT. Proceeding with trade..."
+            )
     return True
 
 
-def start_trade(sell_token, buy_token, sell_amount, buy_amount):
-    post_slack(
-        "Sell amount: {} Buy amount: {} Sell token: {} Buy token: {}".format(
-            sell_amount, buy_amount, sell_token, buy_token
-        )
-    )
+@telemetry.span("0x_quote")
+def get_firm_quote(sell_token, buy_token, sell_amount, buy_amount, venue=None):
+    venue = venue or primary_venue
     params = {
         "sellToken": sell_token,
         "buyToken": buy_token,
@@ -339,99 +585,710 @@ def start_trade(sell_token, buy_token, sell_amount, buy_amount):
         "slippagePercentage": SLIPPAGE_PERCENTAGE,
     }
     headers = {"0x-api-key": ZX_API_KEY}
-    response = requests.get(ZEROX_QUOTE_ENDPOINT, params=params, headers=headers)
-    quote = response.json()
-    print(quote)
-    end_trade(quote)
+    quote = zero_ex_api.get_json(venue.quote_endpoint, params, headers)
+    print(
+        "Fetched 0x quote: sell {} buy {} at {}".format(
+            quote.get("sellAmount"), quote.get("buyAmount"), quote.get("price")
+        )
+    )
+    return quote
 
 
-def end_trade(quote):
+def start_trade(sell_token, buy_token, sell_amount, buy_amount, quote=None, venue=None):
+    venue = venue or primary_venue
+    if quote is None:
+        quote = get_firm_quote(sell_token, buy_token, sell_amount, buy_amount, venue)
+    txn_hash = end_trade(quote, venue)
+    post_slack(
+        "[{}] Sell amount: {} Buy amount: {} Sell token: {} Buy token: {}".format(
+            venue.name, sell_amount, buy_amount, sell_token, buy_token
+        )
+        + f"\nTransaction sent! Hash: {txn_hash.hex()}"
+    )
+    return txn_hash
+
+
+def end_trade(quote, venue=None):
+    network = (venue or primary_venue).network
     transaction = {
         "from": ETH_ADDRESS,
         "to": Web3.to_checksum_address(quote["to"]),
         "data": quote["data"],
         "value": int(quote["value"]),
         "gas": int(quote["gas"]),
-        "gasPrice": int(quote["gasPrice"]),
-        "nonce": w3.eth.get_transaction_count(ETH_ADDRESS),
+        "chainId": network.chain_id,
+        "nonce": network.nonce_manager.next(),
     }
+    # Fees come from the gas model's latest block; 0x's gas price until it has one
+    if network.gas_model.ready():
+        transaction.update(network.gas_model.fee_fields())
+    else:
+        transaction["gasPrice"] = int(quote["gasPrice"])
 
-    signed_txn = w3.eth.account.sign_transaction(transaction, PRIVATE_KEY)
+    with telemetry.span("sign"):
+        signed_txn = network.w3.eth.account.sign_transaction(transaction, PRIVATE_KEY)
 
-    txn_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+    try:
+        with telemetry.span("send"):
+            txn_hash = network.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+    except Exception:
+        # The nonce may or may not have been used; re-read it before the next trade
+        network.nonce_manager.reset()
+        raise
     print(f"Transaction sent! Hash: {txn_hash.hex()}")
+    return txn_hash
 
-    receipt = w3.eth.wait_for_transaction_receipt(txn_hash)
+
+def on_receipt(txn_hash, receipt):
     print(f"Transaction receipt received! Status: {receipt.status}")
-    post_slack(f"Transaction sent! Hash: {txn_hash.hex()}")
+    post_slack(
+        f"Transaction confirmed! Hash: {txn_hash.hex()} Status: {receipt.status}"
+    )
+
+
+def on_receipt_error(txn_hash, error, manager):
+    print(f"No receipt for {txn_hash.hex()}: {error}")
+    manager.reset()
+    post_slack(f"Transaction not confirmed! Hash: {txn_hash.hex()} Error: {error}")
 
 
 def post_slack(message):
-    slack_message_payload = {"text": message}
-    response = requests.post(
-        SLACK_WEBHOOK_URL,
-        headers={"Content-type": "application/json"},
-        data=json.dumps(slack_message_payload),
+    # Only enqueues; delivery happens on the notifier's own thread
+    slack_notifier.notify(message)
+
+
+@dataclass
+class Network:
+    # Per-chain state shared by every venue on the chain. Venues sign from the
+    # same account, so they share its nonces and pending receipts, and take the
+    # trade lock so two venues never spend the same inventory at once
+    name: str
+    w3: Web3
+    multicall: Multicall
+    amkt_token: str
+    chain_id: int
+    gas_price_oracle: str
+    gas_model: GasModel
+    nonce_manager: NonceManager
+    receipt_tracker: ReceiptTracker
+    trade_lock: asyncio.Lock
+
+
+@dataclass
+class Venue:
+    # One AMKT pair on one network, with its own 0x endpoints and trade sizer
+    name: str
+    network: Network
+    quote_symbol: str
+    quote_token: str
+    quote_decimals: int
+    quote_reference: str
+    quote_native: bool
+    price_endpoint: str
+    quote_endpoint: str
+    trade_sizer: TradeSizer = None
+
+    def quote_price(self, market_data):
+        if self.quote_reference is None:
+            return 1.0
+        return market_data[self.quote_reference]["price"]
+
+
+@dataclass
+class NavState:
+    virtual_units: list
+    market_data: dict
+    steth_per_wsteth: int
+    nav: float
+    eth_price: float
+    mainnet_block: int
+
+
+@dataclass
+class MarketSnapshot:
+    venue: Venue
+    virtual_units: list
+    market_data: dict
+    steth_per_wsteth: int
+    nav: float
+    eth_price: float
+    quote_price: float
+    price_info: dict  # None when the venue gave no price for the reference size
+    probes: dict
+    buy_probes: dict
+    quotes: dict  # trade candidate -> firm quote future prefetched for it
+    gas_price: int
+    data_fee: int
+    quote_balance: Decimal
+    amkt_balance: float
+    mainnet_block: int
+    venue_block: int
+    fetched_at: float
+
+
+def build_network(network_name):
+    settings = network_settings[network_name]
+    network_w3 = network_w3s[network_name]
+    manager = NonceManager(network_w3, ETH_ADDRESS)
+    return Network(
+        name=network_name,
+        w3=network_w3,
+        multicall=Multicall(network_w3, MULTICALL3_ADDRESS),
+        amkt_token=settings["AMKT_TOKEN_ADDRESS"],
+        chain_id=settings["CHAIN_ID"],
+        gas_price_oracle=settings.get("GAS_PRICE_ORACLE"),
+        gas_model=GasModel(PRIORITY_FEE),
+        nonce_manager=manager,
+        receipt_tracker=ReceiptTracker(
+            network_w3,
+            io_executor,
+            on_receipt,
+            functools.partial(on_receipt_error, manager=manager),
+            RECEIPT_TIMEOUT,
+            telemetry.span,
+        ),
+        trade_lock=asyncio.Lock(),
     )
-    if response.status_code != 200:
-        print("Failed to send message to Slack channel")
 
 
-def main():
-    while True:
-        try:
-            print("Checking for arbitrage opportunity...")
-            nav = get_amkt_nav()
-            eth_price = get_eth_usd_price()
-            sell_amount_wei = AMKT_AMOUNT * 10**18
-            price_info = get_0x_price(
-                AMKT_TOKEN_ADDRESS, ETH_TOKEN_ADDRESS, sell_amount_wei
-            )
-            estimated_gas_cost_usd = (
-                int(price_info["estimatedGas"])
-                * int(price_info["gasPrice"])
-                / 10**18
-                * eth_price
+def build_venue(network_name, quote_symbol):
+    settings = network_settings[network_name]
+    quote = settings["QUOTE_TOKENS"][quote_symbol]
+    price_endpoint, quote_endpoint = zero_ex_endpoints(settings)
+    venue = Venue(
+        name=f"{network_name}:{quote_symbol}",
+        network=networks[network_name],
+        quote_symbol=quote_symbol,
+        quote_token=quote["ADDRESS"],
+        quote_decimals=quote["DECIMALS"],
+        quote_reference=quote["REFERENCE"],
+        quote_native=quote["NATIVE"],
+        price_endpoint=price_endpoint,
+        quote_endpoint=quote_endpoint,
+    )
+    venue.trade_sizer = TradeSizer(
+        functools.partial(get_0x_price, venue=venue),
+        AMKT_SIZE_LADDER,
+        SIZE_PROBE_TTL,
+        io_executor,
+        max_fallback_age=SIZE_FALLBACK_AGE,
+        reference_size=AMKT_AMOUNT,
+    )
+    return venue
+
+
+networks = {network_name: build_network(network_name) for network_name in scan_networks}
+venues = [
+    build_venue(network_name, quote_symbol)
+    for network_name, quote_symbol in scan_venues
+]
+# AMKT/ETH on the selected network backs the single-pair helpers and the market log
+primary_venue = next(
+    (v for v in venues if v.network.name == NETWORK and v.quote_symbol == "ETH"),
+    None,
+) or build_venue(NETWORK, "ETH")
+receipt_tracker = networks[NETWORK].receipt_tracker
+
+
+def market_log_columns():
+    return (
+        [
+            "fetched_at",
+            "mainnet_block",
+            "base_block",
+            "nav",
+            "eth_price",
+            "amkt_price",
+            "gas_used",
+            "gas_price",
+            "data_fee",
+            "price_impact",
+            "eth_balance",
+            "amkt_balance",
+            "steth_per_wsteth",
+        ]
+        + [f"units_{symbol}" for symbol in nav_engine.symbols]
+        + [f"price_{symbol}" for symbol in nav_engine.reference_symbols]
+        + [
+            ladder_column(prefix, size)
+            for size in AMKT_SIZE_LADDER
+            for prefix in ("probe_price", "probe_impact", "probe_buy_price")
+        ]
+    )
+
+
+def snapshot_row(snapshot):
+    # Reads the NAV engine's vectors, which still hold this snapshot's inputs
+    # Columns taken from the reference quote are NaN when the venue gave none
+    price_info = snapshot.price_info or {}
+    row = {
+        "fetched_at": snapshot.fetched_at,
+        "mainnet_block": snapshot.mainnet_block,
+        "base_block": snapshot.venue_block,
+        "nav": snapshot.nav,
+        "eth_price": snapshot.eth_price,
+        "amkt_price": float(price_info.get("price", np.nan)),
+        "gas_used": float(price_info.get("estimatedGas", np.nan)),
+        "gas_price": snapshot.gas_price or float(price_info.get("gasPrice", np.nan)),
+        "data_fee": snapshot.data_fee,
+        "price_impact": float(price_info.get("estimatedPriceImpact", np.nan)),
+        "eth_balance": float(snapshot.quote_balance),
+        "amkt_balance": snapshot.amkt_balance,
+        "steth_per_wsteth": snapshot.steth_per_wsteth / 10**18,
+    }
+    row.update(zip((f"units_{s}" for s in nav_engine.symbols), nav_engine.units))
+    row.update(
+        zip((f"price_{s}" for s in nav_engine.reference_symbols), nav_engine.prices)
+    )
+    # Fallback prices stand in for shed probes and are left out of the log
+    for size, info in snapshot.probes.items():
+        if info.get("stale"):
+            continue
+        row[ladder_column("probe_price", size)] = float(info["price"])
+        row[ladder_column("probe_impact", size)] = float(info["estimatedPriceImpact"])
+    for size, info in snapshot.buy_probes.items():
+        if info.get("stale"):
+            continue
+        row[ladder_column("probe_buy_price", size)] = float(info["price"])
+    return row
+
+
+market_recorder = (
+    MarketRecorder(MARKET_LOG_DIR, market_log_columns(), {"ladder": AMKT_SIZE_LADDER})
+    if MARKET_LOG_DIR
+    else None
+)
+
+
+def run_io(func, *args):
+    # Carries the current check's trace over to the worker thread
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(
+        io_executor, context.run, func, *args
+    )
+
+
+async def gather_nav():
+    (mainnet_block, virtual_units, steth_per_wsteth), market_data = (
+        await asyncio.gather(run_io(get_mainnet_state), run_io(get_market_data))
+    )
+    # Prices are read alongside the basket; an asset it has just gained needs them
+    # read again now that the feed tracks it
+    if set(nav_engine.reference_symbols) - market_data.keys():
+        market_data = await run_io(get_market_data)
+    return NavState(
+        virtual_units=virtual_units,
+        market_data=market_data,
+        steth_per_wsteth=steth_per_wsteth,
+        nav=calculate_nav(virtual_units, market_data, steth_per_wsteth),
+        eth_price=market_data["ETH"]["price"],
+        mainnet_block=mainnet_block,
+    )
+
+
+def reference_edge(price_info, nav, quote_price, selling):
+    # Edge (%) of trading the reference size after price impact, before gas
+    price_usd = amkt_price_usd(price_info, quote_price, selling)
+    return ((price_usd - nav) if selling else (nav - price_usd)) / nav * 100
+
+
+def trade_candidate(venue, selling, size):
+    amount_wei = int(size * 10**18)
+    if selling:
+        return (venue.network.amkt_token, venue.quote_token, amount_wei, None)
+    return (venue.quote_token, venue.network.amkt_token, None, amount_wei)
+
+
+def prefetch_size(venue, selling):
+    # Last check's best size is the likeliest trade; the first check has only the
+    # reference size to go on
+    return venue.trade_sizer.provisional.get(selling, AMKT_AMOUNT)
+
+
+async def prefetch_quote(venue, nav_future, selling, price_info, quotes):
+    # Starts a firm quote as soon as the reference probe shows an edge, so it
+    # overlaps the balance read and the rest of the ladder
+    try:
+        nav_state = await nav_future
+    except Exception:
+        return  # the snapshot itself reports the failure
+    quote_price = venue.quote_price(nav_state.market_data)
+    edge = reference_edge(price_info, nav_state.nav, quote_price, selling)
+    if (
+        edge >= SPECULATIVE_QUOTE_THRESHOLD
+        and not venue.network.receipt_tracker.pending
+    ):
+        candidate = trade_candidate(venue, selling, prefetch_size(venue, selling))
+        quotes[candidate] = run_io(get_firm_quote, *candidate, venue)
+
+
+async def gather_snapshot(block_identifier="latest", venue=None, nav_future=None):
+    # The NAV does not depend on the venue; a scan passes one shared future so it
+    # is fetched once per check while each venue reads its own balances and prices
+    venue = venue or primary_venue
+    started_at = time.perf_counter()
+    nav_future = asyncio.ensure_future(nav_future or gather_nav())
+    quotes = {}
+    prefetches = []
+
+    def on_reference(selling, price_info):
+        prefetches.append(
+            asyncio.ensure_future(
+                prefetch_quote(venue, nav_future, selling, price_info, quotes)
             )
-            estimated_price_impact = float(price_info["estimatedPriceImpact"])
+        )
 
-            amkt_price_usd = float(price_info["price"]) * eth_price
+    nav_state, (venue_block, quote_balance, amkt_balance), (probes, buy_probes) = (
+        await asyncio.gather(
+            nav_future,
+            run_io(get_venue_state, venue, block_identifier),
+            venue.trade_sizer.probe(
+                venue.network.amkt_token, venue.quote_token, on_reference
+            ),
+        )
+    )
+    await asyncio.gather(*prefetches)
+    gas_model = venue.network.gas_model
+    snapshot = MarketSnapshot(
+        venue=venue,
+        virtual_units=nav_state.virtual_units,
+        market_data=nav_state.market_data,
+        steth_per_wsteth=nav_state.steth_per_wsteth,
+        nav=nav_state.nav,
+        eth_price=nav_state.eth_price,
+        quote_price=venue.quote_price(nav_state.market_data),
+        price_info=probes.get(AMKT_AMOUNT),
+        probes=probes,
+        buy_probes=buy_probes,
+        quotes=quotes,
+        gas_price=gas_model.gas_price() if gas_model.ready() else None,
+        data_fee=gas_model.data_fee(),
+        quote_balance=quote_balance,
+        amkt_balance=amkt_balance,
+        mainnet_block=nav_state.mainnet_block,
+        venue_block=venue_block,
+        fetched_at=time.time(),
+    )
+    print(f"Gathered {venue.name} snapshot in {time.perf_counter() - started_at:.3f}s")
+    return snapshot
+
+
+def stale_prices(snapshot):
+    # Market prices the NAV or the quote asset rests on that are past PRICE_MAX_AGE
+    held = [
+        symbol
+        for symbol, exposure in zip(nav_engine.reference_symbols, nav_engine.exposure)
+        if exposure
+    ]
+    if snapshot.venue.quote_reference is not None:
+        held.append(snapshot.venue.quote_reference)
+    return sorted(
+        symbol
+        for symbol in set(held)
+        if symbol in snapshot.market_data
+        and snapshot.market_data[symbol]["age"] > PRICE_MAX_AGE
+    )
+
+
+def trade_gas_cost_usd(snapshot, probes):
+    # L2 gas at the gas model's price plus the L1 data fee, paid in ETH. 0x's own
+    # gas price stands in until the model has seen a block
+    gas = np.median([int(info["estimatedGas"]) for info in probes.values()])
+    gas_price = snapshot.gas_price
+    if gas_price is None:
+        gas_price = np.median([int(info["gasPrice"]) for info in probes.values()])
+    return (gas * gas_price + snapshot.data_fee) / 10**18 * snapshot.eth_price
 
-            print(f"Estimated gas cost: ${estimated_gas_cost_usd}")
-            print(f"Estimated price impact: {estimated_price_impact}%")
 
-            premium_or_discount = (amkt_price_usd - nav) / nav * 100
-            print(f"Premium or discount: {premium_or_discount}%")
+def evaluate_snapshot(snapshot):
+    # Prices selling and buying AMKT from their own 0x ladders and compares the
+    # expected net profit of each in USD; the better one trades if it pays
+    venue = snapshot.venue
+    nav = snapshot.nav
+    quote_price = snapshot.quote_price
 
-            inventory_validated = validate_inventory(
-                nav, eth_price, premium_or_discount
+    sides = []
+    for selling, probes in ((True, snapshot.probes), (False, snapshot.buy_probes)):
+        if not probes:
+            continue
+        direction = "Sell" if selling else "Buy"
+        reference = probes.get(AMKT_AMOUNT)
+        edge = None
+        if reference is not None:
+            edge = reference_edge(reference, nav, quote_price, selling)
+        gas_cost_usd = trade_gas_cost_usd(snapshot, probes)
+        max_size = inventory_limit(
+            nav,
+            quote_price,
+            1 if selling else -1,
+            snapshot.quote_balance,
+            snapshot.amkt_balance,
+        )
+        trade_size, expected_profit_usd = venue.trade_sizer.best_size(
+            probes, nav, quote_price, selling, max_size, gas_cost_usd
+        )
+        print(
+            f"{direction}: edge {edge}%, gas ${gas_cost_usd:.4f}, best size "
+            f"{trade_size} AMKT (expected ${expected_profit_usd:.4f})"
+        )
+        stale = any(info.get("stale") for info in probes.values())
+        # A prefetched firm quote saves a round trip; its size trades when it earns
+        # nearly as much as the best one
+        size = prefetch_size(venue, selling)
+        prefetched = trade_candidate(venue, selling, size) in snapshot.quotes
+        if prefetched and trade_size is not None and size <= max_size:
+            profit = venue.trade_sizer.expected_profit(
+                probes, nav, quote_price, selling, size, max_size, gas_cost_usd
             )
+            if profit >= SPECULATIVE_PROFIT_SHARE * expected_profit_usd:
+                print(f"{direction}: trading {size} AMKT on the prefetched quote")
+                trade_size, expected_profit_usd = size, profit
+        if trade_size is None:
+            venue.trade_sizer.provisional.pop(selling, None)
+        else:
+            venue.trade_sizer.provisional[selling] = trade_size
+        sides.append((expected_profit_usd, selling, trade_size, edge, stale))
 
-            if not inventory_validated:
-                print("Inventory validation failed. Skipping trade...")
-            elif abs(premium_or_discount) < estimated_price_impact:
-                print("Price impact is too high. Skipping trade...")
-            # Check if buying AMKT with ETH is profitable (AMKT at a discount to NAV)
-            elif amkt_price_usd < nav - estimated_gas_cost_usd:
-                print("Arbitrage opportunity found! Buying AMKT with ETH...")
-                start_trade(
-                    ETH_TOKEN_ADDRESS, AMKT_TOKEN_ADDRESS, None, sell_amount_wei
-                )
-            # Check if selling AMKT for ETH is profitable (AMKT at a premium to NAV)
-            elif amkt_price_usd > nav + estimated_gas_cost_usd:
-                print("Arbitrage opportunity found! Selling AMKT for ETH...")
-                start_trade(
-                    AMKT_TOKEN_ADDRESS, ETH_TOKEN_ADDRESS, sell_amount_wei, None
+    # Premium of the mid between the two reference prices, for the scheduler and
+    # monitoring; one direction alone is off by the spread
+    reference_prices = [
+        amkt_price_usd(probes[AMKT_AMOUNT], quote_price, selling)
+        for selling, probes in ((True, snapshot.probes), (False, snapshot.buy_probes))
+        if AMKT_AMOUNT in probes
+    ]
+    # NaN when the venue priced neither reference trade
+    premium_or_discount = np.nan
+    if reference_prices:
+        premium_or_discount = (np.mean(reference_prices) - nav) / nav * 100
+    print(f"Premium or discount: {premium_or_discount}%")
+    # Near a tradeable edge every ladder size is worth a fresh 0x price next check
+    edges = [side[3] for side in sides if side[3] is not None]
+    venue.trade_sizer.urgent = bool(edges) and max(edges) > -URGENT_PREMIUM_MARGIN
+
+    if not sides:
+        print("No 0x prices for this venue. Skipping trade...")
+        return premium_or_discount, None
+    expected_profit_usd, selling, trade_size, _, stale = max(sides, key=lambda s: s[0])
+    if trade_size is None or expected_profit_usd < MIN_PROFIT_USD:
+        print("No arbitrage opportunity found. Waiting for next interval...")
+        return premium_or_discount, None
+    if stale:
+        # Fallback prices only point at an opportunity; the next check quotes the
+        # whole ladder fresh at high priority before anything trades
+        venue.trade_sizer.urgent = True
+        print("Best size rests on fallback 0x prices. Re-quoting before trading...")
+        return premium_or_discount, None
+    old_prices = stale_prices(snapshot)
+    if old_prices:
+        # Urgency makes the next check refresh them from the reserved CMC budget
+        venue.trade_sizer.urgent = True
+        print(f"NAV rests on stale {', '.join(old_prices)} prices. Refreshing first...")
+        return premium_or_discount, None
+
+    candidate = trade_candidate(venue, selling, trade_size)
+    trade = None
+    if not validate_inventory(
+        nav,
+        quote_price,
+        1 if selling else -1,
+        quote_balance=snapshot.quote_balance,
+        amkt_balance=snapshot.amkt_balance,
+        amount=trade_size,
+        quote_symbol=venue.quote_symbol,
+    ):
+        print("Inventory validation failed. Skipping trade...")
+    elif selling:
+        print(f"Arbitrage opportunity found! Selling AMKT for {venue.quote_symbol}...")
+        trade = candidate
+    else:
+        print(f"Arbitrage opportunity found! Buying AMKT with {venue.quote_symbol}...")
+        trade = candidate
+    return premium_or_discount, trade
+
+
+scheduler = BlockScheduler(
+    w3,
+    min_interval=MIN_CHECK_INTERVAL,
+    max_interval=CHECK_INTERVAL,
+    backoff_factor=CHECK_BACKOFF_FACTOR,
+    price_move_threshold=PRICE_MOVE_THRESHOLD,
+    poll_interval=BLOCK_POLL_INTERVAL,
+    ws_url=WS_RPC_URL,
+)
+
+
+price_feed = PriceFeed(
+    PriceTable(),
+    MARKET_SYMBOLS,
+    PRICE_STREAM_URL,
+    get_cmc_prices,
+    PRICE_MAX_AGE,
+    PRICE_HARD_MAX_AGE,
+    on_update=scheduler.notify_prices,
+)
+# Underlyings outside the usual market symbols are priced from the same feed
+price_feed.add_symbols(nav_engine.reference_symbols)
+
+
+def reference_prices(market_data):
+    return {symbol: data["price"] for symbol, data in market_data.items()}
+
+
+async def execute_trade(trade, quote_future=None, venue=None):
+    venue = venue or primary_venue
+    network = venue.network
+    async with network.trade_lock:
+        if network.receipt_tracker.pending:
+            # Balances are not final until the previous trade confirms
+            print("Previous transaction still pending. Skipping trade...")
+            return
+        started_at = time.perf_counter()
+        quote = await (quote_future or run_io(get_firm_quote, *trade, venue))
+        txn_hash = await run_io(start_trade, *trade, quote, venue)
+        print(f"Decision-to-broadcast time: {time.perf_counter() - started_at:.3f}s")
+        network.receipt_tracker.track(txn_hash)
+    return txn_hash
+
+
+async def check_venue(venue, trigger, nav_future):
+    # Only the selected network's reads can be pinned to the triggering block
+    block_identifier = (
+        trigger.block_number if venue.network.name == NETWORK else "latest"
+    )
+    with telemetry.span("snapshot"):
+        snapshot = await gather_snapshot(block_identifier, venue, nav_future)
+    if market_recorder and venue is primary_venue:
+        market_recorder.record(snapshot_row(snapshot))
+    premium_or_discount, trade = evaluate_snapshot(snapshot)
+    latency = scheduler.record_decision(trigger)
+    print(f"{venue.name} {trigger.reason}-to-decision latency: {latency:.3f}s")
+    telemetry.set_value(f"{venue.name} premium_or_discount", premium_or_discount)
+    result = {"premium_or_discount": premium_or_discount, "block_to_decision": latency}
+    if trade:
+        result["trade"] = trade
+        with telemetry.span("trade"):
+            txn_hash = await execute_trade(trade, snapshot.quotes.get(trade), venue)
+        result["txn_hash"] = txn_hash and Web3.to_hex(txn_hash)
+    return result
+
+
+def slowest_stage(record):
+    # snapshot and trade wrap other stages; the slowest upstream is a leaf
+    stages = [s for s in record["stages"] if s["stage"] not in ("snapshot", "trade")]
+    return max(stages, key=lambda s: s["seconds"], default=None)
+
+
+def log_cycle(record):
+    slowest = slowest_stage(record)
+    summary = (
+        f"Check {record['cycle']} ({record['outcome']}) took {record['seconds']:.3f}s"
+    )
+    if slowest:
+        summary += f", slowest stage {slowest['stage']} {slowest['seconds']:.3f}s"
+    print(summary)
+
+
+# Tasks that live as long as run(); the event loop only holds weak references to
+# tasks, so these keep them from being collected mid-flight
+background_tasks = set()
+
+
+async def run():
+    scheduler.start()
+    for network in networks.values():
+        try:
+            await run_io(network.nonce_manager.sync)
+        except Exception as e:
+            print(f"Could not prefetch {network.name} nonce: ", e)
+    if PRICE_STREAM_URL:
+        background_tasks.add(asyncio.create_task(price_feed.run()))
+    last_premiums = {}
+    while True:
+        # Cycles run back to back: the next trigger is only awaited once this
+        # cycle, including any trade broadcast, has finished
+        trigger = await scheduler.wait_for_trigger()
+        trace = telemetry.start_cycle(reason=trigger.reason, block=trigger.block_number)
+        changed = False
+        prices = None
+        outcome = "no_trade"
+        error = None
+        try:
+            print(
+                f"Checking {len(venues)} venue(s) for arbitrage ({trigger.reason})..."
+            )
+            # One NAV fetch per check, shared by every venue
+            nav_future = asyncio.ensure_future(gather_nav())
+            results = await asyncio.gather(
+                *(check_venue(venue, trigger, nav_future) for venue in venues),
+                return_exceptions=True,
+            )
+            venue_results = {}
+            outcomes = set()
+            for venue, result in zip(venues, results):
+                if isinstance(result, Exception):
+                    error = error or result
+                    outcomes.add("error")
+                    print(
+                        f"{venue.name} check failed: {type(result).__name__}: {result}"
+                    )
+                    traceback.print_exception(result)
+                    venue_results[venue.name] = {
+                        "error": f"{type(result).__name__}: {result}"
+                    }
+                    continue
+                venue_results[venue.name] = result
+                premium_or_discount = result["premium_or_discount"]
+                last_premium = last_premiums.get(venue.name)
+                changed = changed or "trade" in result
+                # A check without a premium leaves the last one to compare against
+                if not np.isnan(premium_or_discount):
+                    changed = changed or (
+                        last_premium is None
+                        or abs(premium_or_discount - last_premium)
+                        >= PREMIUM_CHANGE_THRESHOLD
+                    )
+                    last_premiums[venue.name] = premium_or_discount
+                if "trade" in result:
+                    outcomes.add("trade" if result["txn_hash"] else "skipped_pending")
+            trace.fields["venues"] = venue_results
+            nav_state = await nav_future
+            prices = reference_prices(nav_state.market_data)
+            trace.fields.update(nav=nav_state.nav, eth_price=nav_state.eth_price)
+            telemetry.set_value("nav", nav_state.nav)
+            # Empty until a venue check has reached a decision
+            summary = scheduler.latency_summary()
+            if summary:
+                print(
+                    f"Block-to-decision p50 {summary['p50']:.3f}s over "
+                    f"{summary['count']} decisions"
                 )
-            else:
-                print("No arbitrage opportunity found. Waiting for next interval...")
-            pass
+            outcome = next(
+                (o for o in ("trade", "error", "skipped_pending") if o in outcomes),
+                "no_trade",
+            )
         except Exception as e:
-            print("Error: ", e)
+            outcome = "error"
+            error = e
+            print(f"Check failed: {type(e).__name__}: {e}")
+            traceback.print_exc()
         finally:
-            # Wait for the next interval
-            time.sleep(CHECK_INTERVAL)
+            for api in (zero_ex_api, cmc_api):
+                telemetry.set_value(f"{api.name} budget", api.bucket.available())
+            log_cycle(telemetry.finish_cycle(trace, outcome, error))
+            scheduler.cycle_finished(changed, prices)
+
+
+def main():
+    if METRICS_PORT:
+        telemetry.registry.serve(int(METRICS_PORT))
+        print(f"Serving metrics on http://127.0.0.1:{METRICS_PORT}/metrics")
+    slack_notifier.start()
+    try:
+        asyncio.run(run())
+    finally:
+        # Deliver whatever is still queued before exiting
+        slack_notifier.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
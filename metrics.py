@@ -0,0 +1,248 @@
+import bisect
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; spans from sub-millisecond NAV maths to slow receipts
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(n, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for n, v in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        for labels, value in values.items():
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels, value):
+        with self.lock:
+            self.values[labels] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self.values = {}
+
+    def observe(self, *labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self.lock:
+            values = {k: (list(c), s) for k, (c, s) in self.values.items()}
+        names = self.labelnames + ("le",)
+        for labels, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    _format_labels(names, labels + (bound,)),
+                    cumulative,
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum", label_text, total
+            yield f"{self.name}_count", label_text, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        # Prometheus text exposition format
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                data = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+@dataclass
+class CycleTrace:
+    cycle: int
+    started_at: float
+    perf_started_at: float
+    fields: dict = field(default_factory=dict)
+    spans: list = field(default_factory=list)
+    finished: bool = False
+
+
+class Telemetry:
+    # Times each stage of a check into a latency histogram and an error counter,
+    # and collects the spans of the current check into one trace record. The
+    # current trace is a context variable, so spans opened on executor threads
+    # land in the check that started them as long as the context is copied over
+    def __init__(self, trace_path=None, namespace="amkt_bot"):
+        self.trace_path = trace_path
+        self.registry = Registry()
+        self.stage_seconds = self.registry.register(
+            Histogram(f"{namespace}_stage_seconds", "Time spent in a stage", ["stage"])
+        )
+        self.stage_errors = self.registry.register(
+            Counter(
+                f"{namespace}_stage_errors_total",
+                "Stages that raised, by exception type",
+                ["stage", "error"],
+            )
+        )
+        self.cycle_seconds = self.registry.register(
+            Histogram(f"{namespace}_cycle_seconds", "Wall time of a whole check")
+        )
+        self.cycles = self.registry.register(
+            Counter(f"{namespace}_cycles_total", "Checks by outcome", ["outcome"])
+        )
+        self.gauges = self.registry.register(
+            Gauge(f"{namespace}_last_value", "Latest value seen by a check", ["name"])
+        )
+        self.current = contextvars.ContextVar("cycle_trace", default=None)
+        self.cycle_count = 0
+        self.trace_lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage):
+        trace = self.current.get()
+        started_at = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = type(e).__name__
+            self.stage_errors.inc(stage, error)
+            raise
+        finally:
+            seconds = time.perf_counter() - started_at
+            self.stage_seconds.observe(stage, value=seconds)
+            if trace is not None and not trace.finished:
+                span = {
+                    "stage": stage,
+                    "start": round(started_at - trace.perf_started_at, 6),
+                    "seconds": round(seconds, 6),
+                }
+                if error:
+                    span["error"] = error
+                trace.spans.append(span)
+
+    def set_value(self, name, value):
+        self.gauges.set(name, value=value)
+
+    def start_cycle(self, **fields):
+        self.cycle_count += 1
+        trace = CycleTrace(
+            self.cycle_count, time.time(), time.perf_counter(), dict(fields)
+        )
+        self.current.set(trace)
+        return trace
+
+    def finish_cycle(self, trace, outcome, error=None):
+        seconds = time.perf_counter() - trace.perf_started_at
+        trace.finished = True
+        self.current.set(None)
+        self.cycle_seconds.observe(value=seconds)
+        self.cycles.inc(outcome)
+
+        record = {
+            "cycle": trace.cycle,
+            "started_at": trace.started_at,
+            "seconds": round(seconds, 6),
+            "outcome": outcome,
+            **trace.fields,
+            "stages": trace.spans,
+        }
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        if self.trace_path:
+            line = json.dumps(record, default=str)
+            with self.trace_lock, open(self.trace_path, "a") as f:
+                f.write(line + "\n")
+        return record
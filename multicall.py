@@ -0,0 +1,103 @@
+from dataclasses import dataclass, field
+
+from eth_abi import decode, encode
+from web3 import Web3
+
+# Multicall3 is deployed at the same address on Ethereum, Base and most EVM chains
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Call3[]",
+                "name": "calls",
+                "type": "tuple[]",
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Result[]",
+                "name": "returnData",
+                "type": "tuple[]",
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function",
+    },
+    {
+        "inputs": [],
+        "name": "getBlockNumber",
+        "outputs": [
+            {"internalType": "uint256", "name": "blockNumber", "type": "uint256"}
+        ],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+
+
+@dataclass
+class Call:
+    target: str
+    call_data: bytes
+    # None returns the raw return data, for outputs whose type varies by contract
+    output_types: list = field(default_factory=list)
+    allow_failure: bool = False
+
+
+def make_call(target, signature, args=(), output_types=(), allow_failure=False):
+    # Signatures use flat argument lists, e.g. "balanceOf(address)"
+    arg_types = signature[signature.index("(") + 1 : -1]
+    arg_types = [t for t in arg_types.split(",") if t]
+    selector = Web3.keccak(text=signature)[:4]
+    return Call(
+        target=Web3.to_checksum_address(target),
+        call_data=selector + encode(arg_types, list(args)),
+        output_types=None if output_types is None else list(output_types),
+        allow_failure=allow_failure,
+    )
+
+
+class Multicall:
+    def __init__(self, w3, address=MULTICALL3_ADDRESS):
+        self.w3 = w3
+        self.address = Web3.to_checksum_address(address)
+        self.contract = w3.eth.contract(address=self.address, abi=MULTICALL3_ABI)
+
+    def get_eth_balance_call(self, account):
+        return make_call(self.address, "getEthBalance(address)", [account], ["uint256"])
+
+    def get_basefee_call(self):
+        return make_call(self.address, "getBasefee()", output_types=["uint256"])
+
+    def call(self, calls, block_identifier="latest"):
+        # getBlockNumber rides along as the first call so every batch reports the
+        # block it was answered at, even when the caller asked for "latest"
+        batch = [make_call(self.address, "getBlockNumber()", output_types=["uint256"])]
+        batch.extend(calls)
+        results = self.contract.functions.aggregate3(
+            [(c.target, c.allow_failure, c.call_data) for c in batch]
+        ).call(block_identifier=block_identifier)
+
+        values = []
+        for c, (success, return_data) in zip(batch, results):
+            if not success:
+                values.append(None)
+                continue
+            if c.output_types is None:
+                values.append(bytes(return_data))
+                continue
+            decoded = decode(c.output_types, return_data)
+            values.append(decoded[0] if len(decoded) == 1 else decoded)
+        return values[0], values[1:]
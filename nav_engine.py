@@ -0,0 +1,121 @@
+import time
+
+import numpy as np
+
+
+class NavEngine:
+    # Precomputed NAV over a fixed asset universe. Units, multipliers and prices are
+    # kept as vectors so NAV is a single dot product, and a price-only update never
+    # touches the per-asset tables
+    def __init__(self, addresses, decimals, references):
+        self.symbols = list(addresses)
+        self.symbol_index = {s: i for i, s in enumerate(self.symbols)}
+        self.index = {addresses[s].lower(): i for i, s in enumerate(self.symbols)}
+        self.scale = np.array([10.0 ** -decimals[s] for s in self.symbols])
+
+        self.reference_symbols = sorted(set(references[s] for s in self.symbols))
+        self.reference_index = {s: i for i, s in enumerate(self.reference_symbols)}
+        # mapping[i, j] == 1 when asset i is priced off reference asset j
+        self.mapping = np.zeros((len(self.symbols), len(self.reference_symbols)))
+        for i, symbol in enumerate(self.symbols):
+            self.mapping[i, self.reference_index[references[symbol]]] = 1.0
+
+        self.units = np.zeros(len(self.symbols))
+        self.multipliers = np.ones(len(self.symbols))
+        self.exposure = np.zeros(len(self.reference_symbols))
+        self.prices = np.full(len(self.reference_symbols), np.nan)
+
+    def set_units(self, virtual_units):
+        units = np.zeros(len(self.symbols))
+        units[[self.index[address.lower()] for address, _ in virtual_units]] = [
+            float(amount) for _, amount in virtual_units
+        ]
+        units *= self.scale
+        if not np.array_equal(units, self.units):
+            self.units = units
+            self._update_exposure()
+
+    def set_multiplier(self, symbol, multiplier):
+        i = self.symbol_index[symbol]
+        if self.multipliers[i] != multiplier:
+            self.multipliers[i] = multiplier
+            self._update_exposure()
+
+    def set_prices(self, market_data):
+        self.prices = np.array(
+            [
+                market_data[s]["price"] if s in market_data else np.nan
+                for s in self.reference_symbols
+            ]
+        )
+
+    def _update_exposure(self):
+        # Units of each reference asset held per AMKT
+        self.exposure = (self.units * self.multipliers) @ self.mapping
+
+    def nav(self):
+        nav = float(self.exposure @ self.prices)
+        if np.isnan(nav):
+            # Only reference assets actually held need a price
+            held = self.exposure != 0
+            missing = held & np.isnan(self.prices)
+            if missing.any():
+                raise KeyError(
+                    [s for s, m in zip(self.reference_symbols, missing) if m]
+                )
+            nav = float(self.exposure[held] @ self.prices[held])
+        return nav
+
+
+def benchmark(assets=28, references=15, iterations=10000):
+    rng = np.random.default_rng(0)
+    addresses = {f"A{i}": f"0x{i:040x}" for i in range(assets)}
+    decimals = {s: int(rng.choice([6, 8, 9, 18])) for s in addresses}
+    reference_of = {s: f"R{i % references}" for i, s in enumerate(addresses)}
+    virtual_units = [
+        (addresses[s], int(rng.integers(1, 10**6)) * 10 ** decimals[s])
+        for s in addresses
+    ]
+    market_data = {
+        f"R{i}": {"price": float(rng.uniform(0.01, 60000))} for i in range(references)
+    }
+
+    started_at = time.perf_counter()
+    for i in range(iterations):
+        # Address scan, per-asset dict rebuild and reference lookup, as the bot
+        # priced the basket before this engine
+        units = {
+            next(s for s, a in addresses.items() if a == address): amount
+            for address, amount in virtual_units
+        }
+        numbers = {s: units[s] / 10 ** decimals[s] for s in units}
+        sum(numbers[s] * market_data[reference_of[s]]["price"] for s in numbers)
+    legacy_cycle = (time.perf_counter() - started_at) / iterations
+
+    started_at = time.perf_counter()
+    engine = NavEngine(addresses, decimals, reference_of)
+    build_time = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    for i in range(iterations):
+        engine.units[:] = 0  # force the basket to be re-applied every cycle
+        engine.set_units(virtual_units)
+        engine.set_prices(market_data)
+        engine.nav()
+    full_cycle = (time.perf_counter() - started_at) / iterations
+
+    started_at = time.perf_counter()
+    for i in range(iterations):
+        engine.set_prices(market_data)
+        engine.nav()
+    price_tick = (time.perf_counter() - started_at) / iterations
+
+    print(f"NAV engine over {assets} assets / {references} reference prices")
+    print(f"  legacy loop: {legacy_cycle * 1e6:9.1f} us (per-asset dict walk)")
+    print(f"  build:       {build_time * 1e6:9.1f} us (once at startup)")
+    print(f"  full cycle:  {full_cycle * 1e6:9.1f} us (new units + prices)")
+    print(f"  price tick:  {price_tick * 1e6:9.1f} us (prices only)")
+
+
+if __name__ == "__main__":
+    benchmark()
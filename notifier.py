@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+from collections import deque
+
+
+class SlackNotifier:
+    # Delivers Slack messages from a background thread. Callers only append to a
+    # bounded queue; the thread coalesces whatever has queued up into one post,
+    # keeps posts at least min_interval apart and retries failures with backoff
+    def __init__(
+        self,
+        session,
+        webhook_url,
+        max_queue=100,
+        max_batch=20,
+        batch_window=1.0,
+        min_interval=1.0,
+        max_retries=5,
+        retry_backoff=1.0,
+        timeout=5,
+    ):
+        self.session = session
+        self.webhook_url = webhook_url
+        self.queue = deque(maxlen=max_queue)
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.condition = threading.Condition()
+        self.closing = False
+        self.dropped = 0
+        self.posts = 0
+        self.last_post_at = 0.0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def notify(self, message):
+        if not self.webhook_url:
+            return
+        with self.condition:
+            if len(self.queue) == self.queue.maxlen:
+                # The oldest message is evicted to keep memory bounded
+                self.dropped += 1
+            self.queue.append(message)
+            self.condition.notify()
+
+    def close(self, timeout=10):
+        with self.condition:
+            self.closing = True
+            self.condition.notify()
+        self.thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.closing:
+                    self.condition.wait()
+                if not self.queue and self.closing:
+                    return
+            if not self.closing:
+                # Give related messages a moment to arrive so they share one post
+                time.sleep(self.batch_window)
+            with self.condition:
+                count = min(len(self.queue), self.max_batch)
+                messages = [self.queue.popleft() for _ in range(count)]
+                dropped, self.dropped = self.dropped, 0
+            self._deliver(self._coalesce(messages, dropped))
+
+    def _coalesce(self, messages, dropped):
+        lines = []
+        for message in messages:
+            if lines and lines[-1][0] == message:
+                lines[-1][1] += 1
+            else:
+                lines.append([message, 1])
+        text = "\n".join(m if n == 1 else f"{m} (x{n})" for m, n in lines)
+        if dropped:
+            text += f"\n({dropped} older message(s) dropped)"
+        return text
+
+    def _deliver(self, text):
+        payload = json.dumps({"text": text})
+        delay = self.retry_backoff
+        for attempt in range(self.max_retries + 1):
+            wait = self.last_post_at + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                response = self.session.post(
+                    self.webhook_url,
+                    headers={"Content-type": "application/json"},
+                    data=payload,
+                    timeout=self.timeout,
+                )
+                self.last_post_at = time.monotonic()
+                if response.status_code == 200:
+                    self.posts += 1
+                    return
+                if response.status_code == 429:
+                    delay = max(delay, float(response.headers.get("Retry-After", 0)))
+            except Exception as e:
+                self.last_post_at = time.monotonic()
+                print("Failed to send message to Slack channel: ", e)
+            if attempt < self.max_retries:
+                time.sleep(delay)
+                delay *= 2
+        print("Failed to send message to Slack channel")
+
+
+def benchmark(messages=10000, webhook_latency=0.5):
+    import requests
+
+    from standins import SlackStandIn
+
+    stand_in = SlackStandIn(latency=webhook_latency).start()
+    notifier = SlackNotifier(requests.Session(), stand_in.url, batch_window=0.1)
+    notifier.start()
+
+    started_at = time.perf_counter()
+    for i in range(messages):
+        notifier.notify(f"message {i // 100}")
+    enqueue_time = (time.perf_counter() - started_at) / messages
+
+    started_at = time.perf_counter()
+    notifier.close()
+    drain_time = time.perf_counter() - started_at
+    stand_in.stop()
+
+    print(f"Slack notifier with a {webhook_latency * 1000:.0f} ms webhook")
+    print(f"  enqueue:   {enqueue_time * 1e6:7.2f} us per message")
+    print(f"  delivered: {len(stand_in.messages)} post(s) for {messages} messages")
+    print(f"  queued:    {notifier.queue.maxlen} messages at most")
+    print(f"  drain:     {drain_time:7.3f} s on close")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+
+import websockets
+
+
+@dataclass(frozen=True)
+class PriceEntry:
+    price: float
+    updated_at: float
+    source: str
+
+    @property
+    def age(self):
+        return time.time() - self.updated_at
+
+
+class PriceTable:
+    # Latest price per symbol. Writers swap in a whole immutable entry and readers
+    # take a shallow copy, so neither side needs a lock under the GIL
+    def __init__(self):
+        self.entries = {}
+
+    def update(self, symbol, price, source, updated_at=None):
+        self.entries[symbol] = PriceEntry(price, updated_at or time.time(), source)
+
+    def get(self, symbol):
+        return self.entries.get(symbol)
+
+    def snapshot(self):
+        return dict(self.entries)
+
+
+class PriceFeed:
+    # Keeps the table current from a Binance-style miniTicker websocket stream and
+    # tops it up from a REST snapshot whenever a symbol is missing or too old.
+    # Past max_age the refresh is optional and a failed one keeps the old price;
+    # past hard_max_age it is required and a failure raises. rest_snapshot(symbols,
+    # urgent) spends reserved budget when urgent
+    def __init__(
+        self,
+        table,
+        symbols,
+        stream_url,
+        rest_snapshot,
+        max_age,
+        hard_max_age,
+        on_update=None,
+    ):
+        self.table = table
+        self.symbols = list(symbols)
+        self.stream_url = stream_url
+        self.rest_snapshot = rest_snapshot
+        self.max_age = max_age
+        self.hard_max_age = hard_max_age
+        self.on_update = on_update
+        self.keeping_stale = False
+        self.stream_pairs = {f"{s}USDT": s for s in self.symbols}
+        self.loop = None
+        self.ws = None
+        self.resubscribe = False
+
+    def add_symbols(self, symbols):
+        # Safe to call from any thread. The stream subscribes to its pairs in the
+        # connection URL, so an open connection is closed and run() reconnects
+        # with the new pairs straight away
+        new = [s for s in symbols if s not in self.symbols]
+        if new:
+            self.symbols = self.symbols + new
+            self.stream_pairs = {
+                **self.stream_pairs,
+                **{f"{s}USDT": s for s in new},
+            }
+            ws = self.ws
+            if ws is not None:
+                self.resubscribe = True
+                self.loop.call_soon_threadsafe(asyncio.ensure_future, ws.close())
+
+    def stream_endpoint(self):
+        streams = "/".join(f"{pair.lower()}@miniTicker" for pair in self.stream_pairs)
+        return f"{self.stream_url}/stream?streams={streams}"
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        while True:
+            try:
+                async with websockets.connect(self.stream_endpoint()) as ws:
+                    self.ws = ws
+                    print("Price stream connected")
+                    async for message in ws:
+                        self.handle_message(message)
+            except Exception as e:
+                print("Price stream disconnected: ", e)
+            self.ws = None
+            if self.resubscribe:
+                # Closed by add_symbols; reconnect with the new pairs at once
+                self.resubscribe = False
+                print("Price stream resubscribing")
+                continue
+            await asyncio.sleep(1)
+
+    def handle_message(self, message):
+        ticker = json.loads(message).get("data", {})
+        symbol = self.stream_pairs.get(ticker.get("s"))
+        if symbol is None:
+            return
+        price = float(ticker["c"])
+        self.table.update(symbol, price, "stream", ticker["E"] / 1000)
+        if self.on_update:
+            self.on_update({symbol: price})
+
+    def refresh_from_rest(self, urgent=True):
+        updated_at = time.time()
+        for symbol, price in self.rest_snapshot(self.symbols, urgent).items():
+            entry = self.table.get(symbol)
+            # Never let an older REST quote overwrite a newer streamed one
+            if entry is None or entry.age > self.max_age:
+                self.table.update(symbol, price, "rest", updated_at)
+
+    def market_data(self, urgent=False):
+        # urgent is set while a trade is close; a stale price is then refreshed
+        # from the reserved budget instead of waiting for spare requests
+        entries = self.table.snapshot()
+        ages = [entries[s].age if s in entries else None for s in self.symbols]
+        required = any(age is None or age > self.hard_max_age for age in ages)
+        if required or any(age > self.max_age for age in ages):
+            try:
+                self.refresh_from_rest(urgent=required or urgent)
+                self.keeping_stale = False
+            except Exception as e:
+                if required:
+                    raise
+                # Logged once per streak; the next check tries again
+                if not self.keeping_stale:
+                    print("Keeping stale prices, REST refresh failed: ", e)
+                self.keeping_stale = True
+            entries = self.table.snapshot()
+        return {
+            symbol: {"price": entry.price, "age": entry.age, "source": entry.source}
+            for symbol, entry in entries.items()
+        }
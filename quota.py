@@ -0,0 +1,163 @@
+import threading
+import time
+from concurrent.futures import Future
+
+# Request priorities. HIGH requests may spend the reserve and wait for tokens;
+# LOW requests only run while the bucket is above its reserve and are shed
+# straight away otherwise
+HIGH = "high"
+LOW = "low"
+
+
+class ApiError(Exception):
+    pass
+
+
+class QuotaExceeded(ApiError):
+    pass
+
+
+def retry_after(response):
+    # Seconds form only; HTTP-date values fall back to the normal backoff
+    try:
+        return float(response.headers.get("Retry-After", 0))
+    except ValueError:
+        return 0.0
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def available(self):
+        with self.lock:
+            self._refill()
+            return self.tokens
+
+    def try_acquire(self, cost=1, floor=0.0):
+        # Takes cost tokens only if that leaves at least floor behind
+        with self.lock:
+            self._refill()
+            if self.tokens - cost < floor:
+                return False
+            self.tokens -= cost
+            return True
+
+    def acquire(self, cost=1, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                wait = (cost - self.tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise QuotaExceeded(f"no request budget within {timeout}s")
+            time.sleep(wait)
+
+
+class ApiScheduler:
+    # Every request to one external API goes through here. It spends the API's
+    # token bucket, coalesces identical requests already in flight into one call
+    # (single-flight), and applies a timeout plus retries with backoff on rate
+    # limits, server errors and connection failures
+    def __init__(
+        self,
+        session,
+        name,
+        rate,
+        burst,
+        reserve=0.0,
+        timeout=5,
+        max_retries=2,
+        retry_backoff=0.5,
+        max_wait=2.0,
+        events=None,
+    ):
+        self.session = session
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.reserve = reserve
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_wait = max_wait
+        # Optional labelled counter (api, event) for requests, coalesced
+        # requests, shed requests, retries and errors
+        self.events = events
+        self.lock = threading.Lock()
+        self.in_flight = {}
+
+    def _event(self, event):
+        if self.events is not None:
+            self.events.inc(self.name, event)
+
+    def _spend(self, priority, cost):
+        if priority == LOW:
+            if not self.bucket.try_acquire(cost, floor=self.reserve):
+                self._event("shed")
+                raise QuotaExceeded(f"{self.name} budget reserved for urgent requests")
+        else:
+            self.bucket.acquire(cost, timeout=self.max_wait)
+
+    def get_json(self, url, params=None, headers=None, priority=HIGH, cost=1):
+        key = (url, tuple(sorted((params or {}).items())))
+        with self.lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self.in_flight[key] = Future()
+        if not leader:
+            self._event("coalesced")
+            return future.result()
+
+        try:
+            future.set_result(self._request(url, params, headers, priority, cost))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+        return future.result()
+
+    def _request(self, url, params, headers, priority, cost):
+        delay = self.retry_backoff
+        for attempt in range(self.max_retries + 1):
+            # Retries finish a request that already had the budget to start
+            self._spend(priority if attempt == 0 else HIGH, cost)
+            self._event("request" if attempt == 0 else "retry")
+            try:
+                response = self.session.get(
+                    url, params=params, headers=headers, timeout=self.timeout
+                )
+            except Exception as e:
+                # Connection errors and timeouts
+                cause = e
+                error = ApiError(f"{self.name} request failed: {e}")
+            else:
+                # Client errors carry the API's own error body back to the caller
+                if response.status_code != 429 and response.status_code < 500:
+                    return response.json()
+                cause = None
+                if response.status_code == 429:
+                    error = QuotaExceeded(f"{self.name} rate limited the request")
+                    delay = max(delay, retry_after(response))
+                else:
+                    error = ApiError(f"{self.name} returned {response.status_code}")
+            if attempt < self.max_retries:
+                time.sleep(delay)
+                delay *= 2
+        self._event("error")
+        raise error from cause
@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+COLUMN_DTYPE = np.float64
+
+
+def ladder_column(prefix, size):
+    return f"{prefix}_{size:g}"
+
+
+class MarketRecorder:
+    # Appends one row per check to a columnar log: a directory holding one raw
+    # float64 file per column plus a columns.json header, so every column can be
+    # memory-mapped straight into NumPy for replay. A log keeps the columns it was
+    # started with; when they change (the basket gained an asset, a newer bot
+    # records more) recording moves on to the next free directory, log.1, log.2...
+    def __init__(self, directory, columns, metadata=None):
+        self.base_directory = directory
+        self.metadata = metadata or {}
+        self.lock = threading.Lock()
+        self.files = []
+        self._open(columns)
+
+    def _claim_directory(self):
+        directory = self.base_directory
+        version = 0
+        while True:
+            header_path = os.path.join(directory, "columns.json")
+            if not os.path.exists(header_path):
+                os.makedirs(directory, exist_ok=True)
+                with open(header_path, "w") as f:
+                    json.dump({"columns": self.columns, "metadata": self.metadata}, f)
+                return directory
+            with open(header_path) as f:
+                if json.load(f)["columns"] == self.columns:
+                    return directory
+            version += 1
+            directory = f"{self.base_directory}.{version}"
+
+    def _open(self, columns):
+        self.columns = list(columns)
+        self.directory = self._claim_directory()
+        if self.directory != self.base_directory:
+            print(f"Market log columns changed; recording to {self.directory}")
+        self.files = [
+            open(os.path.join(self.directory, f"{column}.f64"), "ab")
+            for column in self.columns
+        ]
+        self.rows = 0
+
+    def set_columns(self, columns):
+        with self.lock:
+            if list(columns) == self.columns:
+                return
+            self._close()
+            self._open(columns)
+
+    def record(self, row):
+        with self.lock:
+            values = np.array(
+                [row.get(column, np.nan) for column in self.columns],
+                dtype=COLUMN_DTYPE,
+            )
+            for f, value in zip(self.files, values):
+                f.write(value.tobytes())
+                f.flush()
+            self.rows += 1
+
+    def _close(self):
+        for f in self.files:
+            f.close()
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+
+def load_market_log(directory):
+    with open(os.path.join(directory, "columns.json")) as f:
+        header = json.load(f)
+    itemsize = np.dtype(COLUMN_DTYPE).itemsize
+    paths = [os.path.join(directory, f"{c}.f64") for c in header["columns"]]
+    # A crash mid-row can leave columns one value apart; replay the complete rows
+    rows = min(os.path.getsize(p) // itemsize for p in paths)
+    columns = {
+        column: (
+            np.memmap(path, dtype=COLUMN_DTYPE, mode="r", shape=(rows,))
+            if rows
+            else np.zeros(0, dtype=COLUMN_DTYPE)
+        )
+        for column, path in zip(header["columns"], paths)
+    }
+    return columns, header["metadata"]
@@ -0,0 +1,141 @@
+import json
+import os
+import threading
+from dataclasses import astuple, dataclass, replace
+
+from eth_abi import decode
+from web3 import Web3
+
+from multicall import make_call
+
+
+@dataclass(frozen=True)
+class Asset:
+    address: str
+    symbol: str  # as reported by the token
+    label: str  # name used for the NAV engine and the market log
+    decimals: int
+    reference: str  # market data symbol the asset is priced off
+
+
+def decode_symbol(return_data):
+    # Most tokens return a string; some older ones (e.g. MKR) a bytes32
+    if not return_data:
+        return ""
+    try:
+        return decode(["string"], return_data)[0]
+    except Exception:
+        return return_data[:32].rstrip(b"\0").decode(errors="ignore")
+
+
+class AssetRegistry:
+    # Metadata of the vault's underlyings, read from chain and kept in a small JSON
+    # file together with the block it was read at. Startup only loads the file;
+    # sync() reads decimals() and symbol() in one batch for addresses not seen
+    # before, so the RPC is only touched when the basket actually changes
+    def __init__(self, multicall, vault_address, known, path=None):
+        self.multicall = multicall
+        self.vault_address = Web3.to_checksum_address(vault_address)
+        # known maps label -> (address, reference) for underlyings whose label or
+        # market reference the token's own symbol does not give
+        self.known = {
+            address.lower(): (label, reference)
+            for label, (address, reference) in known.items()
+        }
+        self.path = path
+        self.assets = {}
+        self.block = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            data = json.load(f)
+        if data["vault"] != self.vault_address:
+            return False
+        # The file only caches what the chain says; labels and references from
+        # known win over the ones saved with it
+        self.assets = {}
+        for row in data["assets"]:
+            asset = Asset(*row)
+            label, reference = self.known.get(
+                asset.address.lower(), (asset.label, asset.reference)
+            )
+            self.assets[asset.address.lower()] = replace(
+                asset, label=label, reference=reference
+            )
+        self.block = data["block"]
+        print(f"Loaded {len(self.assets)} assets as of block {self.block}")
+        return True
+
+    def save(self):
+        if not self.path:
+            return
+        data = {
+            "vault": self.vault_address,
+            "block": self.block,
+            "assets": [astuple(asset) for asset in self.assets.values()],
+        }
+        # Written aside and renamed so a crash never leaves half a file behind
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(self.path + ".tmp", self.path)
+
+    def refresh(self, block_identifier="latest"):
+        block_number, (underlying,) = self.multicall.call(
+            [make_call(self.vault_address, "underlying()", output_types=["address[]"])],
+            block_identifier,
+        )
+        return self.sync(underlying, block_number)
+
+    def sync(self, addresses, block_identifier="latest"):
+        # Returns the assets added; an empty list means the basket is already known
+        new = [
+            address
+            for address in dict.fromkeys(Web3.to_checksum_address(a) for a in addresses)
+            if address.lower() not in self.assets
+        ]
+        if not new:
+            return []
+        with self.lock:
+            calls = []
+            for address in new:
+                calls.append(make_call(address, "decimals()", output_types=["uint8"]))
+                calls.append(
+                    make_call(
+                        address, "symbol()", output_types=None, allow_failure=True
+                    )
+                )
+            block_number, values = self.multicall.call(calls, block_identifier)
+            added = []
+            labels = {asset.label for asset in self.assets.values()}
+            for address, decimals, symbol_data in zip(new, values[::2], values[1::2]):
+                if address.lower() in self.assets:
+                    continue
+                symbol = decode_symbol(symbol_data)
+                label, reference = self.known.get(address.lower(), (None, None))
+                if label is None:
+                    label = reference = symbol.upper() or address
+                    if label in labels:
+                        label = f"{label}_{address[2:8]}"
+                    print(
+                        f"New underlying {symbol} ({address}) is priced as "
+                        f"{reference}; add it to KNOWN_ASSETS if that is wrong"
+                    )
+                asset = Asset(address, symbol, label, decimals, reference)
+                self.assets[address.lower()] = asset
+                labels.add(label)
+                added.append(asset)
+            self.block = block_number
+            self.save()
+        return added
+
+    def addresses(self):
+        return {a.label: a.address for a in self.assets.values()}
+
+    def decimals(self):
+        return {a.label: a.decimals for a in self.assets.values()}
+
+    def references(self):
+        return {a.label: a.reference for a in self.assets.values()}
@@ -0,0 +1,184 @@
+import contextlib
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+from web3.providers.base import JSONBaseProvider
+
+# Methods that change chain state are sent once, to one endpoint; racing them
+# would broadcast the same transaction twice
+WRITE_METHODS = {"eth_sendRawTransaction", "eth_sendTransaction"}
+RATE_LIMIT_CODES = {429, -32005, -32029}
+# Errors from an endpoint that has not seen the requested block yet; another
+# endpoint may well have it
+MISSING_BLOCK_ERRORS = ("header not found", "unknown block", "block not found")
+
+
+class EndpointError(Exception):
+    pass
+
+
+class Endpoint:
+    def __init__(self, url, window):
+        self.url = url
+        self.name = urlparse(url).netloc or url
+        self.latencies = deque(maxlen=window)
+        self.ewma = None
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    def p95(self):
+        latencies = sorted(self.latencies)
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    # Spreads JSON-RPC requests over several endpoints of one chain. Requests go
+    # to the endpoint with the lowest smoothed latency; a read that outlives that
+    # endpoint's p95 is hedged to the next one and the first answer wins. An
+    # endpoint that fails max_failures times in a row is ejected for
+    # eject_seconds and only used again once nothing healthy is left
+    def __init__(
+        self,
+        urls,
+        session,
+        timeout=10,
+        window=200,
+        min_samples=20,
+        default_hedge_delay=0.5,
+        min_hedge_delay=0.05,
+        ewma_alpha=0.2,
+        max_failures=3,
+        eject_seconds=30,
+        max_workers=32,
+        span=None,
+    ):
+        super().__init__()
+        if not urls:
+            raise ValueError("PooledHTTPProvider needs at least one endpoint")
+        self.endpoints = [Endpoint(url, window) for url in urls]
+        self.session = session
+        self.timeout = timeout
+        self.min_samples = min_samples
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.ewma_alpha = ewma_alpha
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        # Optional context manager factory used to time each endpoint request
+        self.span = span or (lambda stage: contextlib.nullcontext())
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def __str__(self):
+        return f"Pooled RPC {', '.join(e.name for e in self.endpoints)}"
+
+    def ranked(self):
+        now = time.monotonic()
+        with self.lock:
+            healthy = [e for e in self.endpoints if e.ejected_until <= now]
+            ejected = [e for e in self.endpoints if e.ejected_until > now]
+            # Endpoints without samples sort first so every endpoint gets measured
+            healthy.sort(key=lambda e: e.ewma or 0.0)
+            ejected.sort(key=lambda e: e.ejected_until)
+        return healthy + ejected
+
+    def hedge_delay(self, endpoint):
+        with self.lock:
+            if len(endpoint.latencies) < self.min_samples:
+                return self.default_hedge_delay
+            return max(self.min_hedge_delay, endpoint.p95())
+
+    def _record(self, endpoint, seconds, ok):
+        with self.lock:
+            if ok:
+                endpoint.failures = 0
+                endpoint.latencies.append(seconds)
+                endpoint.ewma = (
+                    seconds
+                    if endpoint.ewma is None
+                    else endpoint.ewma + self.ewma_alpha * (seconds - endpoint.ewma)
+                )
+                return
+            endpoint.failures += 1
+            if endpoint.failures < self.max_failures:
+                return
+            endpoint.failures = 0
+            endpoint.ejected_until = time.monotonic() + self.eject_seconds
+        print(f"Ejecting RPC endpoint {endpoint.name} for {self.eject_seconds}s")
+
+    def _send(self, endpoint, request_data):
+        started_at = time.perf_counter()
+        try:
+            with self.span(f"rpc {endpoint.name}"):
+                response = self.session.post(
+                    endpoint.url,
+                    data=request_data,
+                    headers={"Content-Type": "application/json"},
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+                decoded = self.decode_rpc_response(response.content)
+                error = decoded.get("error") if isinstance(decoded, dict) else None
+                if error and error.get("code") in RATE_LIMIT_CODES:
+                    raise EndpointError(f"{endpoint.name} rate limited: {error}")
+                message = str((error or {}).get("message", "")).lower()
+                if any(text in message for text in MISSING_BLOCK_ERRORS):
+                    raise EndpointError(f"{endpoint.name} is behind: {error}")
+        except Exception:
+            self._record(endpoint, time.perf_counter() - started_at, False)
+            raise
+        # Other JSON-RPC errors (reverts, bad params) are answers, not failures
+        self._record(endpoint, time.perf_counter() - started_at, True)
+        return decoded
+
+    def _submit(self, endpoint, request_data):
+        # Runs in a copy of the caller's context so tracing follows the request
+        context = contextvars.copy_context()
+        return self.executor.submit(context.run, self._send, endpoint, request_data)
+
+    def make_request(self, method, params):
+        request_data = self.encode_rpc_request(method, params)
+        endpoints = self.ranked()
+        if method in WRITE_METHODS or len(endpoints) == 1:
+            return self._send(endpoints[0], request_data)
+
+        primary, backups = endpoints[0], endpoints[1:]
+        futures = {self._submit(primary, request_data): primary}
+        delay = self.hedge_delay(primary)
+        hedged = False
+        last_error = None
+        while True:
+            done, _ = wait(
+                futures, timeout=delay if backups else None, return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                endpoint = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if hedged and endpoint is not primary:
+                    self.hedge_wins += 1
+                # Slower requests still in flight finish in the background
+                return result
+            if backups:
+                # The leader outlived its p95, or an endpoint failed outright
+                if not done:
+                    hedged = True
+                    self.hedges += 1
+                backup = backups.pop(0)
+                futures[self._submit(backup, request_data)] = backup
+                delay = self.hedge_delay(backup)
+            elif not futures:
+                raise last_error
+
+
+def parse_urls(value):
+    return [url.strip() for url in value.split(",") if url.strip()]
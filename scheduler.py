@@ -0,0 +1,164 @@
+import asyncio
+import json
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import websockets
+
+
+@dataclass
+class Trigger:
+    reason: str
+    block_number: int
+    seen_at: float  # when the new block or the price move was noticed
+
+
+class BlockScheduler:
+    # Decides when the next cycle runs. Cycles start on a new block once the current
+    # interval has elapsed, or straight away when a watched price moves past the
+    # threshold. The interval grows while cycles see nothing new and snaps back to
+    # the minimum as soon as something changes
+    def __init__(
+        self,
+        w3,
+        min_interval,
+        max_interval,
+        backoff_factor,
+        price_move_threshold,
+        poll_interval,
+        ws_url=None,
+    ):
+        self.w3 = w3
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.price_move_threshold = price_move_threshold
+        self.poll_interval = poll_interval
+        self.ws_url = ws_url
+
+        self.interval = min_interval
+        self.next_cycle_at = 0.0
+        self.latest_block = 0
+        self.latest_block_seen_at = 0.0
+        self.last_cycle_block = 0
+        self.reference_prices = {}
+        self.price_moved = False
+        self.price_moved_at = 0.0
+        self.latencies = deque(maxlen=1000)
+        self.loop = None
+        self.wakeup = None
+        self.watcher = None
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        watch = self._watch_heads if self.ws_url else self._poll_blocks
+        self.watcher = asyncio.create_task(watch())
+
+    def _on_block(self, block_number):
+        if block_number > self.latest_block:
+            self.latest_block = block_number
+            self.latest_block_seen_at = time.monotonic()
+            self.wakeup.set()
+
+    async def _poll_blocks(self):
+        while True:
+            try:
+                self._on_block(await asyncio.to_thread(self.w3.eth.get_block_number))
+            except Exception as e:
+                print("Block poll failed: ", e)
+            await asyncio.sleep(self.poll_interval)
+
+    async def _watch_heads(self):
+        while True:
+            try:
+                async with websockets.connect(self.ws_url) as ws:
+                    await ws.send(
+                        json.dumps(
+                            {
+                                "jsonrpc": "2.0",
+                                "id": 1,
+                                "method": "eth_subscribe",
+                                "params": ["newHeads"],
+                            }
+                        )
+                    )
+                    await ws.recv()
+                    async for message in ws:
+                        head = json.loads(message)["params"]["result"]
+                        self._on_block(int(head["number"], 16))
+            except Exception as e:
+                # Fall back to polling for a while, then retry the subscription
+                print("newHeads subscription failed, polling instead: ", e)
+                try:
+                    await asyncio.wait_for(self._poll_blocks(), self.max_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def notify_prices(self, prices):
+        # Safe to call from any thread with a {symbol: price} mapping
+        if not self.reference_prices:
+            self.reference_prices = dict(prices)
+            return
+        for symbol, price in prices.items():
+            reference = self.reference_prices.get(symbol)
+            if reference and abs(price - reference) / reference >= (
+                self.price_move_threshold
+            ):
+                if not self.price_moved:
+                    self.price_moved_at = time.monotonic()
+                self.price_moved = True
+                if self.loop is not None:
+                    self.loop.call_soon_threadsafe(self.wakeup.set)
+                return
+
+    async def wait_for_trigger(self):
+        while True:
+            self.wakeup.clear()
+            now = time.monotonic()
+            if self.price_moved:
+                reason = "price move"
+                seen_at = self.price_moved_at
+                break
+            if self.latest_block > self.last_cycle_block and now >= self.next_cycle_at:
+                reason = "new block"
+                seen_at = self.latest_block_seen_at
+                break
+            timeout = max(self.next_cycle_at - now, 0) or None
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        self.price_moved = False
+        self.last_cycle_block = self.latest_block
+        return Trigger(reason, self.latest_block, seen_at)
+
+    def record_decision(self, trigger):
+        # Latency from whatever triggered the cycle; only block triggers feed the
+        # block-to-decision series
+        latency = time.monotonic() - trigger.seen_at
+        if trigger.reason == "new block":
+            self.latencies.append(latency)
+        return latency
+
+    def cycle_finished(self, changed, prices=None):
+        if prices:
+            self.reference_prices = dict(prices)
+        if changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff_factor, self.max_interval)
+        self.next_cycle_at = time.monotonic() + self.interval
+
+    def latency_summary(self):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return {
+            "p50": statistics.median(ordered),
+            "p90": ordered[int(0.9 * (len(ordered) - 1))],
+            "count": len(ordered),
+        }
@@ -0,0 +1,171 @@
+import asyncio
+import contextvars
+import time
+
+import numpy as np
+
+from cache import TTLCache
+from quota import HIGH, LOW, ApiError
+
+
+def amkt_price_usd(price_info, quote_price, selling):
+    # 0x prices are buy token per sell token: quote asset per AMKT when selling
+    # AMKT, AMKT per quote asset when buying it
+    price = float(price_info["price"])
+    return price * quote_price if selling else quote_price / price
+
+
+class TradeSizer:
+    # Quotes a ladder of AMKT sizes in both directions at once, fits how the
+    # effective price moves with size and picks the size with the best expected
+    # profit after gas. The reference size is always requested at high priority;
+    # the rest of the ladder only while the venue is urgent or the API budget has
+    # room. A shed low priority probe falls back on the last price seen for that
+    # size if it is at most max_fallback_age old; such prices are marked stale
+    def __init__(
+        self,
+        fetch_price,
+        ladder,
+        probe_ttl,
+        executor=None,
+        grid_points=200,
+        reference_size=None,
+        max_fallback_age=0,
+    ):
+        self.fetch_price = fetch_price
+        self.ladder = sorted(ladder)
+        self.probe_ttl = probe_ttl
+        self.executor = executor
+        self.grid_points = grid_points
+        self.reference_size = reference_size
+        self.max_fallback_age = max_fallback_age
+        # Set by the evaluator while either direction is close to tradeable
+        self.urgent = False
+        # Best size of each direction (keyed by selling) at the last check; the
+        # next check prefetches its firm quote at that size
+        self.provisional = {}
+        self.cache = TTLCache()
+        self.last_good = {}
+
+    def _probe(self, sell_token, buy_token, size, selling):
+        # Selling fixes the AMKT sold, buying the AMKT bought
+        key = (sell_token, buy_token, size)
+        price_info = self.cache.get(key)
+        if price_info is None:
+            priority = HIGH if self.urgent or size == self.reference_size else LOW
+            amount = int(size * 10**18)
+            try:
+                if selling:
+                    price_info = self.fetch_price(
+                        sell_token, buy_token, amount, priority=priority
+                    )
+                else:
+                    price_info = self.fetch_price(
+                        sell_token,
+                        buy_token,
+                        None,
+                        priority=priority,
+                        buy_amount=amount,
+                    )
+            except ApiError:
+                last_good, fetched_at = self.last_good.get(key, (None, 0.0))
+                if (
+                    priority == HIGH
+                    or last_good is None
+                    or time.monotonic() - fetched_at > self.max_fallback_age
+                ):
+                    raise
+                return {**last_good, "stale": True}
+            self.cache.set(key, price_info, self.probe_ttl)
+            if "price" in price_info:
+                self.last_good[key] = (price_info, time.monotonic())
+        return price_info
+
+    async def probe(self, amkt_token, quote_token, on_reference=None):
+        # on_reference(selling, price_info) is called on the loop as soon as each
+        # direction's reference size is priced, before the rest of the ladder
+        loop = asyncio.get_running_loop()
+        legs = [(amkt_token, quote_token, True), (quote_token, amkt_token, False)]
+        # Each probe runs in a copy of the caller's context so tracing follows it
+        futures = [
+            loop.run_in_executor(
+                self.executor,
+                contextvars.copy_context().run,
+                self._probe,
+                sell_token,
+                buy_token,
+                size,
+                selling,
+            )
+            for sell_token, buy_token, selling in legs
+            for size in self.ladder
+        ]
+        if on_reference and self.reference_size in self.ladder:
+            reference = self.ladder.index(self.reference_size)
+            for i, (_, _, selling) in enumerate(legs):
+
+                def priced(future, selling=selling):
+                    if future.cancelled() or future.exception() is not None:
+                        return
+                    if "price" in future.result():
+                        on_reference(selling, future.result())
+
+                futures[i * len(self.ladder) + reference].add_done_callback(priced)
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        # Sizes the venue cannot fill come back without a price and are dropped;
+        # returns the sell and the buy ladder
+        sides = []
+        for i in range(len(legs)):
+            side = results[i * len(self.ladder) : (i + 1) * len(self.ladder)]
+            sides.append(
+                {
+                    size: result
+                    for size, result in zip(self.ladder, side)
+                    if isinstance(result, dict) and "price" in result
+                }
+            )
+        return tuple(sides)
+
+    def _fit(self, probes, quote_price, selling, max_size):
+        sizes = np.array(sorted(probes))
+        sizes = sizes[sizes <= max_size]
+        if len(sizes) == 0:
+            return sizes, 0.0, 0.0
+        prices = np.array(
+            [amkt_price_usd(probes[s], quote_price, selling) for s in sizes]
+        )
+
+        # The effective price moves roughly linearly with size; a single probe only
+        # fixes its level
+        if len(sizes) > 1:
+            slope, intercept = np.polyfit(sizes, prices, 1)
+        else:
+            slope, intercept = 0.0, prices[0]
+        return sizes, slope, intercept
+
+    def expected_profit(
+        self, probes, nav, quote_price, selling, size, max_size, gas_cost_usd
+    ):
+        # Profit of one given size on the same fit best_size picks from
+        sizes, slope, intercept = self._fit(probes, quote_price, selling, max_size)
+        if len(sizes) == 0:
+            return None
+        price = intercept + slope * size
+        edge = price - nav if selling else nav - price
+        return float(size * edge - gas_cost_usd)
+
+    def best_size(self, probes, nav, quote_price, selling, max_size, gas_cost_usd):
+        # Expected profit in USD of trading each size in one direction, net of the
+        # effective price paid or received (impact included) and of gas
+        sizes, slope, intercept = self._fit(probes, quote_price, selling, max_size)
+        if len(sizes) == 0:
+            return None, 0.0
+
+        grid = np.linspace(sizes[0], sizes[-1], self.grid_points)
+        price = intercept + slope * grid
+        edge = price - nav if selling else nav - price
+        profit = grid * edge - gas_cost_usd
+        best = int(np.argmax(profit))
+        if profit[best] <= 0:
+            return None, float(profit[best])
+        return round(float(grid[best]), 4), float(profit[best])
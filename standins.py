@@ -0,0 +1,408 @@
+# Local stand-ins for the bot's upstream services, for testing and benchmarking
+# without touching live endpoints
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import websockets
+from eth_abi import decode, encode
+from eth_account import Account
+from web3 import Web3
+
+from multicall import MULTICALL3_ADDRESS
+
+ETH_PLACEHOLDER = "0xeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee"
+
+
+class HttpStandIn:
+    # Threaded JSON HTTP server. Routes map (method, path) to a handler taking the
+    # query dict and parsed body and returning (status, json-serialisable body).
+    # Every response is delayed by latency plus up to jitter seconds
+    def __init__(self, routes, host="127.0.0.1", port=0, latency=0.0, jitter=0.0):
+        self.routes = routes
+        self.latency = latency
+        self.jitter = jitter
+        self.request_counts = {}
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+            def _respond(self, method):
+                url = urlparse(self.path)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length)) if length else None
+                handler = stand_in.routes.get((method, url.path))
+                key = (method, url.path)
+                stand_in.request_counts[key] = stand_in.request_counts.get(key, 0) + 1
+
+                time.sleep(stand_in.latency + random.uniform(0, stand_in.jitter))
+                if handler is None:
+                    status, payload = 404, {"error": "not found"}
+                else:
+                    status, payload = handler(query, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class SlackStandIn(HttpStandIn):
+    # Incoming-webhook stand-in that records every posted message
+    def __init__(self, **kwargs):
+        self.messages = []
+        super().__init__({("POST", "/"): self.post}, **kwargs)
+
+    def post(self, query, body):
+        self.messages.append(body["text"])
+        return 200, "ok"
+
+
+class CmcStandIn(HttpStandIn):
+    # CoinMarketCap quotes/latest stand-in; unknown symbols are left out, as CMC
+    # does
+    def __init__(self, prices, **kwargs):
+        self.prices = dict(prices)
+        super().__init__(
+            {("GET", "/v1/cryptocurrency/quotes/latest"): self.quotes}, **kwargs
+        )
+
+    def quotes(self, query, body):
+        data = {
+            symbol: {"symbol": symbol, "quote": {"USD": {"price": self.prices[symbol]}}}
+            for symbol in query["symbol"].split(",")
+            if symbol in self.prices
+        }
+        return 200, {"data": data}
+
+
+class CoinGeckoStandIn(HttpStandIn):
+    # CoinGecko simple/price stand-in for USD prices keyed by coin id
+    def __init__(self, prices, **kwargs):
+        self.prices = dict(prices)
+        super().__init__({("GET", "/api/v3/simple/price"): self.simple_price}, **kwargs)
+
+    def simple_price(self, query, body):
+        return 200, {
+            coin: {"usd": self.prices[coin]}
+            for coin in query["ids"].split(",")
+            if coin in self.prices
+        }
+
+
+class ZeroExStandIn(HttpStandIn):
+    # 0x swap/v1 price and quote stand-in for one 18-decimal token. `price` is
+    # the token's mid price in ETH; quote_assets adds other assets it trades
+    # against as {address: (mid price in that asset, decimals)}. Price impact
+    # grows linearly with the token amount and is charged against the taker in
+    # both directions
+    def __init__(
+        self,
+        price,
+        base_impact=0.05,
+        impact_per_unit=0.1,
+        gas=250000,
+        gas_price=10**7,
+        quote_assets=None,
+        **kwargs,
+    ):
+        self.price = price
+        self.quote_assets = {a.lower(): q for a, q in (quote_assets or {}).items()}
+        self.base_impact = base_impact
+        self.impact_per_unit = impact_per_unit
+        self.gas = gas
+        self.gas_price = gas_price
+        super().__init__(
+            {
+                ("GET", "/swap/v1/price"): self.price_route,
+                ("GET", "/swap/v1/quote"): self.quote_route,
+            },
+            **kwargs,
+        )
+
+    def _quote_asset(self, address):
+        if address.lower() == ETH_PLACEHOLDER:
+            return self.price, 18
+        return self.quote_assets.get(address.lower())
+
+    def _fill(self, query):
+        sell_quote = self._quote_asset(query["sellToken"])
+        mid, decimals = sell_quote or self._quote_asset(query["buyToken"])
+        buying_token = sell_quote is not None
+        if "sellAmount" in query:
+            amount = int(query["sellAmount"])
+            tokens = amount / 10**decimals / mid if buying_token else amount / 10**18
+        else:
+            amount = int(query["buyAmount"])
+            tokens = amount / 10**18 if buying_token else amount / 10**decimals / mid
+        impact = self.base_impact + self.impact_per_unit * tokens
+        if buying_token:
+            quote_per_token = mid * (1 + impact / 100)
+            sell_amount = tokens * quote_per_token * 10**decimals
+            buy_amount = tokens * 10**18
+            price = 1 / quote_per_token
+        else:
+            quote_per_token = mid * (1 - impact / 100)
+            sell_amount = tokens * 10**18
+            buy_amount = tokens * quote_per_token * 10**decimals
+            price = quote_per_token
+        return {
+            "sellTokenAddress": query["sellToken"],
+            "buyTokenAddress": query["buyToken"],
+            "sellAmount": str(int(sell_amount)),
+            "buyAmount": str(int(buy_amount)),
+            "price": str(price),
+            "estimatedPriceImpact": str(impact),
+            "estimatedGas": str(self.gas),
+            "gasPrice": str(self.gas_price),
+        }
+
+    def price_route(self, query, body):
+        return 200, self._fill(query)
+
+    def quote_route(self, query, body):
+        quote = self._fill(query)
+        selling_eth = query["sellToken"].lower() == ETH_PLACEHOLDER
+        quote.update(
+            {
+                "to": "0xdef1c0ded9bec7f1a1670819833240f027b25eff",
+                "data": "0x",
+                "value": quote["sellAmount"] if selling_eth else "0",
+                "gas": str(self.gas),
+            }
+        )
+        return 200, quote
+
+
+class RpcStandIn(HttpStandIn):
+    # Anvil-style JSON-RPC node holding just enough state for the bot: view
+    # functions registered with view(), ETH balances, a Multicall3 at the usual
+    # address, a block height that advances every block_time seconds, and a
+    # mempool that accepts any signed transaction and mines it on the spot
+    def __init__(self, chain_id, block_time=2.0, gas_price=10**7, **kwargs):
+        self.chain_id = chain_id
+        self.block_time = block_time
+        self.gas_price = gas_price
+        self.start_block = 1000
+        self.started_at = time.monotonic()
+        self.views = {}
+        self.balances = {}
+        self.receipts = {}
+        self.nonces = {}
+        self.lock = threading.Lock()
+        self.methods = {
+            "eth_chainId": lambda params: hex(self.chain_id),
+            "eth_blockNumber": lambda params: hex(self.block_number()),
+            "eth_gasPrice": lambda params: hex(self.gas_price),
+            "eth_getBalance": lambda params: hex(self.balance(params[0])),
+            "eth_getLogs": lambda params: [],
+            "eth_call": self.eth_call,
+            "eth_getTransactionCount": self.transaction_count,
+            "eth_sendRawTransaction": self.send_raw_transaction,
+            "eth_getTransactionReceipt": lambda params: self.receipts.get(params[0]),
+        }
+        self.view(
+            MULTICALL3_ADDRESS, "getBlockNumber()", ["uint256"], self.block_number
+        )
+        self.view(
+            MULTICALL3_ADDRESS, "getEthBalance(address)", ["uint256"], self.balance
+        )
+        # The node's gas price is all base fee
+        self.view(
+            MULTICALL3_ADDRESS, "getBasefee()", ["uint256"], lambda: self.gas_price
+        )
+        super().__init__({("POST", "/"): self.rpc}, **kwargs)
+
+    def block_number(self):
+        elapsed = time.monotonic() - self.started_at
+        return self.start_block + int(elapsed / self.block_time)
+
+    def balance(self, address):
+        return self.balances.get(address.lower(), 0)
+
+    def view(self, address, signature, output_types, fn):
+        # Signatures use flat argument lists, as in multicall.make_call
+        arg_types = [
+            t for t in signature[signature.index("(") + 1 : -1].split(",") if t
+        ]
+        selector = bytes(Web3.keccak(text=signature)[:4])
+        self.views[(address.lower(), selector)] = (arg_types, output_types, fn)
+
+    def rpc(self, query, body):
+        if isinstance(body, list):
+            return 200, [self._dispatch(request) for request in body]
+        return 200, self._dispatch(body)
+
+    def _dispatch(self, request):
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        method = self.methods.get(request["method"])
+        if method is None:
+            response["error"] = {"code": -32601, "message": "Method not found"}
+            return response
+        try:
+            response["result"] = method(request.get("params", []))
+        except Exception as e:
+            response["error"] = {"code": -32000, "message": str(e)}
+        return response
+
+    def _call(self, address, data):
+        view = self.views.get((address.lower(), data[:4]))
+        if view is None:
+            raise ValueError(f"execution reverted: no view at {address}")
+        arg_types, output_types, fn = view
+        return encode(output_types, [fn(*decode(arg_types, data[4:]))])
+
+    def eth_call(self, params):
+        to = params[0]["to"]
+        data = bytes.fromhex(params[0]["data"][2:])
+        aggregate3 = bytes(Web3.keccak(text="aggregate3((address,bool,bytes)[])")[:4])
+        if to.lower() == MULTICALL3_ADDRESS.lower() and data[:4] == aggregate3:
+            (calls,) = decode(["(address,bool,bytes)[]"], data[4:])
+            results = []
+            for target, allow_failure, call_data in calls:
+                try:
+                    results.append((True, self._call(target, call_data)))
+                except Exception:
+                    if not allow_failure:
+                        raise ValueError("execution reverted: Multicall3: call failed")
+                    results.append((False, b""))
+            return Web3.to_hex(encode(["(bool,bytes)[]"], [results]))
+        return Web3.to_hex(self._call(to, data))
+
+    def transaction_count(self, params):
+        return hex(self.nonces.get(params[0].lower(), 0))
+
+    def send_raw_transaction(self, params):
+        raw = bytes.fromhex(params[0][2:])
+        sender = Account.recover_transaction(raw)
+        txn_hash = Web3.to_hex(Web3.keccak(raw))
+        block_number = self.block_number()
+        with self.lock:
+            self.nonces[sender.lower()] = self.nonces.get(sender.lower(), 0) + 1
+        self.receipts[txn_hash] = {
+            "transactionHash": txn_hash,
+            "transactionIndex": "0x0",
+            "blockHash": Web3.to_hex(Web3.keccak(block_number.to_bytes(32, "big"))),
+            "blockNumber": hex(block_number),
+            "from": sender,
+            "to": None,
+            "cumulativeGasUsed": hex(21000),
+            "gasUsed": hex(21000),
+            "effectiveGasPrice": hex(self.gas_price),
+            "contractAddress": None,
+            "logs": [],
+            "logsBloom": "0x" + "00" * 256,
+            "status": "0x1",
+            "type": "0x0",
+        }
+        return txn_hash
+
+
+class PriceStreamStandIn:
+    # Serves a Binance-style combined miniTicker stream with random-walk prices
+    def __init__(self, prices, host="127.0.0.1", port=0, interval=0.1, step=0.001):
+        self.prices = dict(prices)
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.step = step
+        self.server = None
+        self.messages_sent = 0
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self):
+        self.server = await websockets.serve(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, ws):
+        try:
+            while True:
+                for symbol in self.prices:
+                    self.prices[symbol] *= 1 + random.uniform(-self.step, self.step)
+                    message = {
+                        "stream": f"{symbol.lower()}usdt@miniTicker",
+                        "data": {
+                            "e": "24hrMiniTicker",
+                            "E": int(time.time() * 1000),
+                            "s": f"{symbol}USDT",
+                            "c": str(self.prices[symbol]),
+                        },
+                    }
+                    await ws.send(json.dumps(message))
+                    self.messages_sent += 1
+                await asyncio.sleep(self.interval)
+        except websockets.ConnectionClosed:
+            pass
+
+
+async def serve_price_stream(port):
+    stand_in = await PriceStreamStandIn(
+        {"BTC": 60000.0, "ETH": 3000.0, "SOL": 150.0}, port=port
+    ).start()
+    print(f"Price stream stand-in listening on {stand_in.url}")
+    await asyncio.Future()
+
+
+def serve_slack(port):
+    stand_in = SlackStandIn(port=port).start()
+    print(f"Slack webhook stand-in listening on {stand_in.url}")
+    seen = 0
+    while True:
+        time.sleep(1)
+        for message in stand_in.messages[seen:]:
+            print(message)
+        seen = len(stand_in.messages)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("service", choices=["price-stream", "slack"])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    if args.service == "price-stream":
+        asyncio.run(serve_price_stream(args.port))
+    elif args.service == "slack":
+        serve_slack(args.port)